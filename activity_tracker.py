@@ -1,60 +1,20 @@
-import sqlite3
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from database.activity_db import ActivityDatabase
 
 class ActivityTracker:
     def __init__(self):
-        self.db_path = 'productivity.db'
-        self.setup_database()
-        
-    def setup_database(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Create tables for tracking productive time
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS productive_sessions (
-                id INTEGER PRIMARY KEY,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                duration INTEGER,
-                date DATE
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        self.db = ActivityDatabase()
+        self.db_path = self.db.db_path
     
     def start_session(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        current_time = datetime.now()
-        c.execute('''
-            INSERT INTO productive_sessions (start_time, date)
-            VALUES (?, ?)
-        ''', (current_time, current_time.date()))
-        
-        conn.commit()
-        conn.close()
+        self.db.start_session(datetime.now())
         
     def end_session(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        current_time = datetime.now()
-        c.execute('''
-            UPDATE productive_sessions 
-            SET end_time = ?, 
-                duration = ROUND((julianday(?) - julianday(start_time)) * 24 * 60)
-            WHERE end_time IS NULL
-        ''', (current_time, current_time))
-        
-        conn.commit()
-        conn.close()
+        self.db.end_session(datetime.now())
 
 class ProductivityApp:
     def __init__(self, root):
@@ -79,20 +39,8 @@ class ProductivityApp:
         self.stats_frame.grid(row=1, column=0, columnspan=3, pady=10)
         
     def show_stats(self):
-        conn = sqlite3.connect(self.tracker.db_path)
-        c = conn.cursor()
-        
         # Get last 7 days of data
-        c.execute('''
-            SELECT date, SUM(duration) 
-            FROM productive_sessions 
-            WHERE date >= date('now', '-7 days')
-                AND duration IS NOT NULL
-            GROUP BY date
-            ORDER BY date
-        ''')
-        
-        results = c.fetchall()  # Store results in a variable
+        results = self.tracker.db.get_daily_totals(days=7)
         
         if not results:  # Check if we have any data
             print("No completed sessions found yet")
@@ -116,8 +64,6 @@ class ProductivityApp:
         canvas = FigureCanvasTkAgg(fig, master=self.stats_frame)
         canvas.draw()
         canvas.get_tk_widget().grid(row=0, column=0)
-        
-        conn.close()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_HEADER_LINES = 100
+# Response bodies kept for repeat requests, least recently used dropped first
+MAX_CACHED_RESPONSES = 64
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request',
+           404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class BadRequest(ValueError):
+    """A query parameter the API can't use; answered with a 400"""
+
+
+def _date_param(query, name):
+    value = query.get(name, [None])[0]
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a YYYY-MM-DD date, got {value!r}")
+
+
+def _int_param(query, name, default):
+    value = query.get(name, [None])[0]
+    if value is None:
+        return default
+    if not value.isdigit():
+        raise BadRequest(f"{name} must be a positive integer, got {value!r}")
+    return int(value)
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return 0
+
+
+class ApiServer:
+    """
+    Read-only JSON API over HTTP/1.1 for dashboards on this machine:
+
+        GET /status                          blocking status and running session
+        GET /sessions?from=YYYY-MM-DD&to=    completed sessions
+        GET /attempts?days=N                 blocked attempts per domain and week
+        GET /rollup?from=&to=&by=day|week|month
+
+    Every response carries an ETag built from PRAGMA data_version and the
+    mtimes of the hosts file and Firefox's user.js. A request whose
+    If-None-Match still matches gets a 304 without any query being run,
+    and a repeated request is answered from the last body built for it.
+    """
+
+    def __init__(self, tracker, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.tracker = tracker
+        self.db = tracker.db
+        self.host = host
+        self.port = port
+        self.server = None
+        self.routes = {
+            '/status': self.get_status,
+            '/sessions': self.get_sessions,
+            '/attempts': self.get_attempts,
+            '/rollup': self.get_rollup,
+        }
+        # Tags from an earlier run of the server must not match this one
+        self._instance = uuid.uuid4().hex[:8]
+        # (path, sorted params) -> (etag, body)
+        self._cache = OrderedDict()
+        self._processor = None
+        # data_version is only comparable on one connection, so every read
+        # runs on this one thread and its reader connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-db')
+
+    @property
+    def monitor(self):
+        return self.tracker.firefox_monitor
+
+    @property
+    def processor(self):
+        # pandas is only imported once a sessions or rollup request comes in
+        if self._processor is None:
+            from gui.stats.data_processor import SessionDataProcessor
+            self._processor = SessionDataProcessor(self.db)
+        return self._processor
+
+    def current_etag(self, key):
+        """
+        ETag for the request key as things stand now. data_version covers every
+        table; the file mtimes cover blocking state kept outside the
+        database; the date covers queries relative to today.
+        """
+        monitor = self.monitor
+        user_js = (os.path.join(os.path.dirname(monitor.firefox_path), 'user.js')
+                   if monitor.firefox_path else None)
+        return '"{}-{}-{}-{}-{}-{:x}"'.format(
+            self._instance, self.db.data_version(),
+            _mtime_ns(monitor.hosts_blocker.hosts_path), _mtime_ns(user_js),
+            date.today().toordinal(), hash(key) & 0xffffffff)
+
+    async def respond(self, method, target, headers):
+        """Return (status, extra headers, body bytes) for one request"""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, self._error('Only GET is supported')
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, {}, self._error(f"Unknown endpoint {url.path}")
+        query = parse_qs(url.query)
+        # Parameter order and spelling of the same query share one entry
+        key = (path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+
+        loop = asyncio.get_running_loop()
+        etag = await loop.run_in_executor(self._executor, self.current_etag, key)
+        if etag in (tag.strip() for tag in headers.get('if-none-match', '').split(',')):
+            return 304, {'ETag': etag}, b''
+        cached = self._cache.get(key)
+        if cached and cached[0] == etag:
+            self._cache.move_to_end(key)
+            return 200, {'ETag': etag}, cached[1]
+
+        try:
+            payload = await loop.run_in_executor(self._executor, handler, query)
+        except BadRequest as e:
+            return 400, {}, self._error(str(e))
+        body = json.dumps(payload, default=str).encode()
+        self._cache[key] = (etag, body)
+        self._cache.move_to_end(key)
+        while len(self._cache) > MAX_CACHED_RESPONSES:
+            self._cache.popitem(last=False)
+        return 200, {'ETag': etag}, body
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}).encode()
+
+    # Endpoint handlers, run on the executor thread
+
+    def get_status(self, query):
+        monitor = self.monitor
+        running = self.db.get_open_session()
+        return {
+            'hosts_blocking': monitor.hosts_blocker.is_blocked(),
+            'firefox_report': monitor.check_blocking_status(),
+            'session': {'id': running[0], 'start': running[1].isoformat()} if running else None,
+        }
+
+    def get_sessions(self, query):
+        sessions = self.processor.get_session_data(_date_param(query, 'from'),
+                                                   _date_param(query, 'to'))
+        if sessions is None:
+            return []
+        return [
+            {'date': row.date, 'start': row.start.isoformat(), 'minutes': int(row.duration)}
+            for row in sessions.itertuples(index=False)
+        ]
+
+    def get_attempts(self, query):
+        days = _int_param(query, 'days', 30)
+        return [
+            {'domain': domain, 'week': week, 'attempts': count}
+            for domain, week, count in self.db.get_attempts_per_domain_per_week(days)
+        ]
+
+    def get_rollup(self, query):
+        granularity = query.get('by', ['day'])[0]
+        try:
+            totals = self.processor.get_totals(_date_param(query, 'from'),
+                                               _date_param(query, 'to'), granularity)
+        except ValueError as e:
+            raise BadRequest(str(e))
+        if totals is None:
+            return []
+        return [
+            {'period': period.date().isoformat(), 'sessions': int(row.sessions),
+             'minutes': int(row.minutes), 'shortest': int(row.shortest),
+             'longest': int(row.longest)}
+            for period, row in totals.iterrows()
+        ]
+
+    # HTTP plumbing
+
+    async def handle(self, reader, writer):
+        method = 'GET'
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            for _ in range(MAX_HEADER_LINES):
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) != 3:
+                status, extra, body = 400, {}, self._error('Malformed request line')
+            else:
+                method, target, _ = request_line
+                try:
+                    status, extra, body = await self.respond(method, target, headers)
+                except Exception:
+                    logger.exception("Error handling %s %s", method, target)
+                    status, extra, body = 500, {}, self._error('Internal error')
+
+            head = [f"HTTP/1.1 {status} {REASONS[status]}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    "Cache-Control: no-cache",
+                    "Connection: close"]
+            head += [f"{name}: {value}" for name, value in extra.items()]
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+            if method != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Serving the JSON API on http://%s:%d", self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.server:
+            self.server.close()
+        self._executor.shutdown()
+
+
+def serve(tracker, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the API until interrupted"""
+    try:
+        asyncio.run(ApiServer(tracker, host, port).serve_forever())
+    except KeyboardInterrupt:
+        pass
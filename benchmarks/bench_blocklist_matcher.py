@@ -0,0 +1,74 @@
+"""
+Micro-benchmark for BlocklistMatcher.
+
+Run from the repository root:
+    python -m benchmarks.bench_blocklist_matcher
+
+The time per URL should stay flat as the number of rules grows, while the
+old any()-substring loop grows linearly with the blocklist.
+"""
+import random
+import string
+import time
+from models.blocklist_matcher import BlocklistMatcher
+
+URL_COUNT = 20000
+NAIVE_RULE_LIMIT = 10000  # The linear loop gets too slow to measure beyond this
+
+
+def _random_label(rng, length=8):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def _make_rules(rng, count):
+    # Mostly domains with a sprinkling of path rules, like the real config
+    rules = [f"{_random_label(rng)}.com" for _ in range(count - count // 10)]
+    rules += [f"/{_random_label(rng, 5)}/" for _ in range(count // 10)]
+    return rules
+
+
+def _make_urls(rng, rules, count):
+    hosts = [rule for rule in rules if not rule.startswith('/')]
+    urls = []
+    for i in range(count):
+        if i % 10 == 0:
+            host = f"www.{rng.choice(hosts)}"  # Blocked
+        else:
+            host = f"{_random_label(rng)}.{_random_label(rng, 3)}.org"
+        urls.append(f"https://{host}/{_random_label(rng)}/{_random_label(rng, 12)}?q=1")
+    return urls
+
+
+def _naive_matches(rules, url):
+    return any(site.lower() in url.lower() for site in rules)
+
+
+def _time_per_url(func, urls):
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+    return (time.perf_counter() - start) / len(urls) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'rules':>8} {'build ms':>10} {'matcher us/url':>15} {'any() us/url':>13}")
+    for rule_count in (100, 1000, 10000, 100000):
+        rules = _make_rules(rng, rule_count)
+        urls = _make_urls(rng, rules, URL_COUNT)
+
+        start = time.perf_counter()
+        matcher = BlocklistMatcher(rules)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        matcher_us = _time_per_url(matcher.matches, urls)
+        if rule_count <= NAIVE_RULE_LIMIT:
+            sample = urls[:max(1, URL_COUNT * 100 // rule_count // 10)]
+            naive_us = f"{_time_per_url(lambda url: _naive_matches(rules, url), sample):13.1f}"
+        else:
+            naive_us = f"{'-':>13}"
+        print(f"{rule_count:>8} {build_ms:>10.1f} {matcher_us:>15.2f} {naive_us}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for importing a large blocklist into BlocklistStore.
+
+Run from the repository root:
+    python -m benchmarks.bench_blocklist_store [domain count]
+
+Writes a synthetic hosts-format list to a temp directory, imports it and
+reports import time, store size, peak Python memory during the import and
+the cost of a lookup. Peak memory should stay flat as the list grows.
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from models.blocklist_store import BlocklistStore
+
+LOOKUPS = 20000
+
+
+def _random_label(rng, length=10):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        list_path = os.path.join(tmp, 'hosts.txt')
+        domains = []
+        with open(list_path, 'w') as f:
+            for i in range(count):
+                domain = f"{_random_label(rng)}.{rng.choice(['com', 'net', 'org'])}"
+                if i < LOOKUPS // 2:
+                    domains.append(domain)
+                f.write(f"0.0.0.0 {domain}\n")
+
+        store = BlocklistStore(os.path.join(tmp, 'blocklist.db'))
+        tracemalloc.start()
+        start = time.perf_counter()
+        added = store.import_file(list_path)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        hosts = [f"www.{d}" for d in domains]
+        hosts += [f"{_random_label(rng)}.example.org" for _ in range(LOOKUPS - len(hosts))]
+        start = time.perf_counter()
+        for host in hosts:
+            store.host_blocked(host)
+        lookup_us = (time.perf_counter() - start) / len(hosts) * 1e6
+        store.close()
+
+        print(f"domains:        {added}")
+        print(f"raw list:       {os.path.getsize(list_path) / 1e6:.1f} MB")
+        print(f"store:          {os.path.getsize(store.path) / 1e6:.1f} MB")
+        print(f"import:         {elapsed:.1f} s")
+        print(f"peak Python mem {peak / 1e6:.1f} MB")
+        print(f"lookup:         {lookup_us:.1f} us/host")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Command-line interface for scripts, cron jobs and remote shells.
+
+    python cli.py start | end | scan | status | block | unblock | stats --json
+    python cli.py import-blocklist PATH...
+    python cli.py serve     (local JSON API, see api/server.py)
+
+Each command imports only the modules it needs; nothing here pulls in
+tkinter, matplotlib or pandas, so commands start in tens of milliseconds
+and work without a display.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+def _open_db(args):
+    from database.activity_db import ActivityDatabase
+    return ActivityDatabase(args.db)
+
+
+def _monitor(db):
+    from models.services import get_monitor
+    return get_monitor(db)
+
+
+def _hosts_blocker():
+    from models.hosts_blocker import WebsiteBlocker
+    return WebsiteBlocker()
+
+
+def _print_attempts(attempts):
+    for attempt in attempts:
+        print(f"  {attempt.visit_time.strftime('%Y-%m-%d %H:%M:%S')}  {attempt.url}")
+
+
+def cmd_start(args, db):
+    running = db.get_open_session()
+    if running:
+        print(f"Session {running[0]} already running since {running[1]:%H:%M}")
+        return 1
+    now = datetime.now()
+    session_id = db.start_session(now)
+    print(f"Session {session_id} started at {now:%H:%M}")
+    return 0
+
+
+def cmd_end(args, db):
+    running = db.get_open_session()
+    if not running:
+        print("No active session")
+        return 1
+    session_id, start_time = running
+    attempts = _monitor(db).check_blocked_access(start_time)
+    db.record_attempts(session_id, attempts)
+    end_time = datetime.now()
+    db.end_session(end_time)
+    minutes = round((end_time - start_time).total_seconds() / 60)
+    print(f"Session {session_id} ended after {minutes} minutes, "
+          f"{len(attempts)} blocked attempts")
+    _print_attempts(attempts)
+    return 0
+
+
+def cmd_scan(args, db):
+    running = db.get_open_session()
+    if running and args.minutes is None:
+        session_id, since = running
+    else:
+        session_id = running[0] if running else None
+        since = datetime.now() - timedelta(minutes=args.minutes or 60)
+    attempts = _monitor(db).check_blocked_access(since)
+    db.record_attempts(session_id, attempts)
+    print(f"{len(attempts)} new blocked attempts since {since:%Y-%m-%d %H:%M}")
+    _print_attempts(attempts)
+    return 0
+
+
+def cmd_status(args, db):
+    hosts_blocker = _hosts_blocker()
+    if not args.hosts:
+        print(f"Firefox Blocking:\n{_monitor(db).check_blocking_status()}\n")
+    print(f"Hosts File Blocking: {'Active' if hosts_blocker.is_blocked() else 'Inactive'}")
+    return 0
+
+
+def cmd_block(args, db):
+    if args.hosts:
+        _hosts_blocker().block_websites()
+        return 0
+    upstream = listen = None
+    if args.backend == 'dns':
+        from models.dns_sinkhole import parse_address
+        if not args.upstream:
+            print("--backend dns needs --upstream, the resolver that gets every query "
+                  "that isn't blocked")
+            return 2
+        try:
+            upstream = parse_address(args.upstream)
+            listen = parse_address(args.listen) if args.listen else None
+        except ValueError as e:
+            print(e)
+            return 2
+    monitor = _monitor(db)
+    monitor.dns_upstream, monitor.dns_listen = upstream, listen
+    if not monitor.block_sites(args.backend):
+        return 1
+    if args.backend == 'dns':
+        # The sinkhole lives as long as this process
+        print(f"DNS sinkhole listening on {monitor.dns_sinkhole.listen[0]}:"
+              f"{monitor.dns_sinkhole.listen[1]}, Ctrl-C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            monitor.dns_sinkhole.stop()
+    return 0
+
+
+def cmd_unblock(args, db):
+    if args.hosts:
+        _hosts_blocker().unblock_websites()
+        return 0
+    return 0 if _monitor(db).unblock_sites() else 1
+
+
+def cmd_stats(args, db):
+    since = (date.today() - timedelta(days=args.days)).isoformat()
+    days = [
+        {'date': day, 'sessions': count, 'minutes': total,
+         'shortest': shortest, 'longest': longest}
+        for day, count, total, shortest, longest, _, _ in db.get_daily_rollup(since)
+    ]
+    if args.json:
+        json.dump({'since': since, 'days': days,
+                   'total_minutes': sum(d['minutes'] for d in days)}, sys.stdout, indent=2)
+        print()
+        return 0
+    print(f"{'date':<12}{'sessions':>9}{'minutes':>9}")
+    for d in days:
+        print(f"{d['date']:<12}{d['sessions']:>9}{d['minutes']:>9}")
+    print(f"{'total':<12}{sum(d['sessions'] for d in days):>9}"
+          f"{sum(d['minutes'] for d in days):>9}")
+    return 0
+
+
+def cmd_serve(args, db):
+    from api.server import serve
+    from models.session import SessionTracker
+    serve(SessionTracker(db=db), args.host, args.port)
+    return 0
+
+
+def cmd_import(args, db):
+    from models.blocklist_store import BlocklistStore
+    store = BlocklistStore(args.store)
+    if args.clear:
+        store.clear()
+    for path in args.paths:
+        print(f"{path}: {store.import_file(path)} domains")
+    print(f"{len(store)} imported domains in {args.store}")
+    store.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Productivity tracker')
+    parser.add_argument('--db', default='productivity.db', help='Path to productivity.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('start', help='start a session').set_defaults(func=cmd_start)
+    commands.add_parser('end', help='end the running session and report blocked visits'
+                        ).set_defaults(func=cmd_end)
+    scan = commands.add_parser('scan', help='record blocked visits from Firefox history')
+    scan.add_argument('--minutes', type=int,
+                      help='look back this far instead of to the session start')
+    scan.set_defaults(func=cmd_scan)
+    for name, func, text in (('status', cmd_status, 'show blocking status'),
+                             ('block', cmd_block, 'block sites'),
+                             ('unblock', cmd_unblock, 'unblock sites')):
+        command = commands.add_parser(name, help=text)
+        command.add_argument('--hosts', action='store_true', help='hosts file only')
+        command.set_defaults(func=func)
+        if name == 'block':
+            # Same names as browser_monitor.BLOCKING_BACKENDS, kept literal so
+            # building the parser imports nothing
+            command.add_argument('--backend', default='auto',
+                                 choices=('auto', 'firefox', 'hosts', 'dns'),
+                                 help='dns runs a local DNS sinkhole until interrupted')
+            command.add_argument('--upstream', metavar='HOST[:PORT]',
+                                 help='resolver the dns backend forwards other queries to '
+                                      '(required with --backend dns, no default)')
+            command.add_argument('--listen', metavar='HOST[:PORT]',
+                                 help='address the dns backend listens on (default 127.0.0.1:53)')
+    stats = commands.add_parser('stats', help='daily totals')
+    stats.add_argument('--days', type=int, default=7)
+    stats.add_argument('--json', action='store_true', help='print JSON')
+    stats.set_defaults(func=cmd_stats)
+    blocklist = commands.add_parser(
+        'import-blocklist', help='import hosts-format or one-domain-per-line lists')
+    blocklist.add_argument('paths', nargs='*', metavar='PATH')
+    blocklist.add_argument('--store', default='blocklist.db', help='Path to blocklist.db')
+    blocklist.add_argument('--clear', action='store_true', help='drop previously imported lists')
+    blocklist.set_defaults(func=cmd_import)
+    serve = commands.add_parser('serve', help='local JSON API for dashboards')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Hosts-file actions and imports never touch productivity.db
+    if getattr(args, 'hosts', False) or args.func is cmd_import:
+        return args.func(args, None)
+    db = _open_db(args)
+    try:
+        return args.func(args, db)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    sys.exit(main())
@@ -1,22 +1,326 @@
 import sqlite3
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from datetime import date, datetime, timedelta
+from .migrations import migrate, REBUILD_DAILY_ROLLUP_SQL
+
+
+def to_epoch_us(dt):
+    """Session timestamps are stored as integer epoch microseconds"""
+    return int(dt.timestamp() * 1000000)
+
+
+def from_epoch_us(value):
+    return datetime.fromtimestamp(value / 1000000)
+
+
+def split_attempt_url(url):
+    """Split a URL into its normalized domain and the rest (path and query)"""
+    parts = urlsplit(url)
+    domain = (parts.hostname or '').rstrip('.')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return domain, path
+
+
+def _days_ago(days):
+    return (date.today() - timedelta(days=days)).isoformat()
+
 
 class ActivityDatabase:
-    def __init__(self):
-        self.db_path = 'productivity.db'
+    """
+    Data-access layer for productivity.db.
+
+    A single long-lived connection handles writes behind a lock, and each
+    thread gets its own long-lived read connection. With WAL journaling,
+    readers (the GUI, the history watcher) are not blocked by a write in
+    progress, and because connections are reused, sqlite3's statement
+    cache keeps the queries below prepared between calls.
+    """
+
+    def __init__(self, db_path='productivity.db'):
+        self.db_path = db_path
+        self._write_lock = threading.RLock()
+        self._tx_depth = 0
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect()
         self.setup_database()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run writes on the shared connection, committed as one unit. Nested
+        calls join the outer transaction, which lets WriteBehindQueue
+        commit a whole group of writes at once. The outer call takes the
+        write lock up front (BEGIN IMMEDIATE), so reads made before the
+        first write, like end_session's open sessions, can't be acted on
+        by another process at the same time.
+        """
+        with self._write_lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self._writer
+                finally:
+                    self._tx_depth -= 1
+                return
+            self._tx_depth = 1
+            try:
+                with self._writer:
+                    if not self._writer.in_transaction:
+                        self._writer.execute('BEGIN IMMEDIATE')
+                    yield self._writer
+            finally:
+                self._tx_depth = 0
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def release_reader(self):
+        """
+        Close the calling thread's reader connection. Threads that come and
+        go (a watcher per session) call this before exiting, so their
+        connections don't stay open until close().
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._readers_lock:
+            if conn in self._readers:
+                self._readers.remove(conn)
+        conn.close()
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+        self._local = threading.local()
+        with self._write_lock:
+            self._writer.close()
         
+    def data_version(self):
+        """
+        SQLite's PRAGMA data_version on this thread's reader connection:
+        it changes whenever another connection commits, without reading
+        any table.
+        """
+        return self._reader().execute('PRAGMA data_version').fetchone()[0]
+
     def setup_database(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS productive_sessions (
-                id INTEGER PRIMARY KEY,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                duration INTEGER,
-                date DATE
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            migrate(self._writer)
+
+    def start_session(self, start_time):
+        """Insert an open session and return its id"""
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO productive_sessions (start_time, date)
+                VALUES (?, ?)
+            ''', (to_epoch_us(start_time), start_time.date().isoformat()))
+            return cursor.lastrowid
+
+    def get_open_session(self):
+        """(id, start datetime) of the latest session not yet ended, or None"""
+        row = self._reader().execute('''
+            SELECT id, start_time
+            FROM productive_sessions
+            WHERE end_time IS NULL
+            ORDER BY start_time DESC
+            LIMIT 1
+        ''').fetchone()
+        return (row[0], from_epoch_us(row[1])) if row else None
+
+    def end_session(self, end_time):
+        """
+        Close every open session at end_time and return how many were
+        closed. daily_rollup is updated in the same transaction.
+        """
+        end = to_epoch_us(end_time)
+        with self.transaction() as conn:
+            open_sessions = conn.execute('''
+                SELECT id, start_time, date
+                FROM productive_sessions
+                WHERE end_time IS NULL
+            ''').fetchall()
+            closed = []
+            for session_id, start, day in open_sessions:
+                duration = round((end - start) / 60000000) if start is not None else None
+                closed.append((end, duration, session_id))
+                if duration is not None:
+                    conn.execute('''
+                        INSERT INTO daily_rollup (date, session_count, total_minutes,
+                                                  min_minutes, max_minutes, first_start, last_end)
+                        VALUES (?1, 1, ?2, ?2, ?2, ?3, ?4)
+                        ON CONFLICT(date) DO UPDATE SET
+                            session_count = session_count + 1,
+                            total_minutes = total_minutes + excluded.total_minutes,
+                            min_minutes = MIN(min_minutes, excluded.min_minutes),
+                            max_minutes = MAX(max_minutes, excluded.max_minutes),
+                            first_start = MIN(first_start, excluded.first_start),
+                            last_end = MAX(last_end, excluded.last_end)
+                    ''', (day, duration, start, end))
+            conn.executemany('''
+                UPDATE productive_sessions 
+                SET end_time = ?, duration = ?
+                WHERE id = ?
+            ''', closed)
+            return len(closed)
+
+    def get_completed_sessions(self, days=7):
+        """(date, start_time, duration) of completed sessions in the last days"""
+        return self._reader().execute('''
+            SELECT 
+                date,
+                start_time,
+                duration
+            FROM productive_sessions 
+            WHERE date >= ?
+                AND duration IS NOT NULL
+            ORDER BY date, start_time
+        ''', (_days_ago(days),)).fetchall()
+
+    def get_daily_totals(self, days=7):
+        """(date, total minutes) of completed sessions in the last days"""
+        return self._reader().execute('''
+            SELECT date, total_minutes
+            FROM daily_rollup
+            WHERE date >= ?
+            ORDER BY date
+        ''', (_days_ago(days),)).fetchall()
+
+    def get_daily_rollup(self, since=None, until=None):
+        """
+        Rows of (date, session_count, total_minutes, min_minutes,
+        max_minutes, first_start, last_end) for since <= date <= until;
+        ISO date strings, either bound optional.
+        """
+        return self._reader().execute('''
+            SELECT date, session_count, total_minutes, min_minutes,
+                   max_minutes, first_start, last_end
+            FROM daily_rollup
+            WHERE date >= ? AND date <= ?
+            ORDER BY date
+        ''', (since or '', until or '9999-12-31')).fetchall()
+
+    def read_sessions_frame(self, since, until):
+        """
+        Completed sessions with since <= date <= until (ISO strings) as a
+        pandas DataFrame of date, start_time (epoch us) and duration,
+        fetched column-wise in one read_sql call.
+        """
+        import pandas as pd
+        return pd.read_sql_query('''
+            SELECT date, start_time, duration
+            FROM productive_sessions
+            WHERE date >= ? AND date <= ?
+                AND duration IS NOT NULL
+            ORDER BY date, start_time
+        ''', self._reader(), params=(since, until))
+
+    def read_rollup_frame(self, since, until):
+        """daily_rollup rows with since <= date <= until as a DataFrame"""
+        import pandas as pd
+        return pd.read_sql_query('''
+            SELECT date, session_count, total_minutes, min_minutes, max_minutes
+            FROM daily_rollup
+            WHERE date >= ? AND date <= ?
+            ORDER BY date
+        ''', self._reader(), params=(since, until))
+
+    def rebuild_daily_rollup(self):
+        """Recompute daily_rollup from productive_sessions, return the day count"""
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM daily_rollup')
+            conn.execute(REBUILD_DAILY_ROLLUP_SQL)
+            return conn.execute('SELECT COUNT(*) FROM daily_rollup').fetchone()[0]
+
+    def record_attempts(self, session_id, attempts):
+        """
+        Store the BlockedAttempts of one scan in a single transaction.
+        Visits already stored for the same (profile, visit_id) are skipped.
+        """
+        rows = []
+        for attempt in attempts:
+            domain, path = split_attempt_url(attempt.url)
+            rows.append((session_id, attempt.profile, attempt.visit_id, domain,
+                         path, to_epoch_us(attempt.visit_time)))
+        if not rows:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO domains (name) VALUES (?)',
+                             {(row[3],) for row in rows})
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO access_attempts
+                    (session_id, profile, visit_id, domain_id, path, visit_time)
+                VALUES (?, ?, ?, (SELECT id FROM domains WHERE name = ?), ?, ?)
+            ''', rows)
+            return conn.total_changes - before
+
+    def get_attempts_per_domain_per_week(self, days=365):
+        """(domain, 'YYYY-WW' week, attempt count) over the last days"""
+        since = to_epoch_us(datetime.combine(date.today() - timedelta(days=days), datetime.min.time()))
+        return self._reader().execute('''
+            SELECT d.name,
+                   strftime('%Y-%W', a.visit_time / 1000000, 'unixepoch', 'localtime') AS week,
+                   COUNT(*)
+            FROM access_attempts a
+            JOIN domains d ON d.id = a.domain_id
+            WHERE a.visit_time >= ?
+            GROUP BY d.name, week
+            ORDER BY week, d.name
+        ''', (since,)).fetchall()
+
+    def get_scan_cursor(self, profile):
+        """Return (last_visit_id, last_visit_date) for a profile, or (0, 0)"""
+        row = self._reader().execute('''
+            SELECT last_visit_id, last_visit_date
+            FROM history_scan_cursors
+            WHERE profile = ?
+        ''', (profile,)).fetchone()
+        return row if row else (0, 0)
+
+    def set_scan_cursor(self, profile, last_visit_id, last_visit_date):
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO history_scan_cursors (profile, last_visit_id, last_visit_date)
+                VALUES (?, ?, ?)
+                ON CONFLICT(profile) DO UPDATE SET
+                    last_visit_id = excluded.last_visit_id,
+                    last_visit_date = excluded.last_visit_date
+            ''', (profile, last_visit_id, last_visit_date))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='productivity.db maintenance')
+    parser.add_argument('action', choices=['rebuild-rollup'],
+                        help='rebuild-rollup: backfill daily_rollup from all sessions')
+    parser.add_argument('--db', default='productivity.db', help='Path to productivity.db')
+
+    args = parser.parse_args()
+    db = ActivityDatabase(args.db)
+    if args.action == 'rebuild-rollup':
+        days = db.rebuild_daily_rollup()
+        print(f"Rebuilt daily_rollup for {days} days")
+    db.close()
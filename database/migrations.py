@@ -0,0 +1,141 @@
+"""
+Schema migrations for productivity.db.
+
+The schema version is stored in PRAGMA user_version. Each migration moves
+the database up by one version inside its own transaction, so a crash
+leaves it at the last completed version.
+"""
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _create_base_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS productive_sessions (
+            id INTEGER PRIMARY KEY,
+            start_time TIMESTAMP,
+            end_time TIMESTAMP,
+            duration INTEGER,
+            date DATE
+        )
+    ''')
+    # High-water mark of the Firefox history already scanned, per profile
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS history_scan_cursors (
+            profile TEXT PRIMARY KEY,
+            last_visit_id INTEGER NOT NULL,
+            last_visit_date INTEGER NOT NULL
+        )
+    ''')
+
+
+def _text_to_epoch_us(value):
+    return int(datetime.fromisoformat(value).timestamp() * 1000000)
+
+
+def _epoch_timestamps_and_indexes(conn):
+    """Store start/end times as integer epoch microseconds and index them"""
+    for column in ('start_time', 'end_time'):
+        rows = conn.execute(f'''
+            SELECT id, {column} FROM productive_sessions
+            WHERE typeof({column}) = 'text'
+        ''').fetchall()
+        updates = []
+        for session_id, value in rows:
+            try:
+                updates.append((_text_to_epoch_us(value), session_id))
+            except ValueError:
+                logger.warning("Dropping unparseable %s %r of session %s", column, value, session_id)
+                updates.append((None, session_id))
+        conn.executemany(f'UPDATE productive_sessions SET {column} = ? WHERE id = ?', updates)
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_date ON productive_sessions (date)')
+    # Only open sessions are in this index, so closing one is a single seek
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessions_open ON productive_sessions (start_time)
+        WHERE end_time IS NULL
+    ''')
+
+
+REBUILD_DAILY_ROLLUP_SQL = '''
+    INSERT INTO daily_rollup (date, session_count, total_minutes, min_minutes,
+                              max_minutes, first_start, last_end)
+    SELECT date, COUNT(*), SUM(duration), MIN(duration), MAX(duration),
+           MIN(start_time), MAX(end_time)
+    FROM productive_sessions
+    WHERE duration IS NOT NULL
+    GROUP BY date
+'''
+
+
+def _daily_rollup(conn):
+    """Per-day session aggregates, kept current by ActivityDatabase.end_session"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            date TEXT PRIMARY KEY,
+            session_count INTEGER NOT NULL,
+            total_minutes INTEGER NOT NULL,
+            min_minutes INTEGER NOT NULL,
+            max_minutes INTEGER NOT NULL,
+            first_start INTEGER,
+            last_end INTEGER
+        )
+    ''')
+    conn.execute('DELETE FROM daily_rollup')
+    conn.execute(REBUILD_DAILY_ROLLUP_SQL)
+
+
+def _access_attempts(conn):
+    """Blocked visits found during sessions, with hosts interned in domains"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS domains (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS access_attempts (
+            id INTEGER PRIMARY KEY,
+            session_id INTEGER REFERENCES productive_sessions (id),
+            profile TEXT NOT NULL,
+            visit_id INTEGER NOT NULL,
+            domain_id INTEGER NOT NULL REFERENCES domains (id),
+            path TEXT NOT NULL,
+            visit_time INTEGER NOT NULL,
+            UNIQUE (profile, visit_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attempts_domain_time
+        ON access_attempts (domain_id, visit_time)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attempts_session
+        ON access_attempts (session_id)
+    ''')
+
+
+MIGRATIONS = [
+    _create_base_schema,
+    _epoch_timestamps_and_indexes,
+    _daily_rollup,
+    _access_attempts,
+]
+
+
+def migrate(conn):
+    """Apply pending migrations and return the resulting schema version"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info("Migrating productivity.db to schema version %d", target)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+    return max(version, len(MIGRATIONS))
@@ -0,0 +1,96 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Most operations folded into one commit
+MAX_GROUP_SIZE = 100
+_CLOSE = object()
+
+
+class WriteBehindQueue:
+    """
+    Single writer thread for ActivityDatabase.
+
+    Callers submit operations (callables that use the database) and return
+    immediately. The thread takes every operation waiting in the queue and
+    runs them in one transaction with a single commit (group commit).
+    Each operation runs under its own savepoint, so one failure does not
+    undo the rest of the group. Completion callbacks are handed to notify,
+    which the GUI points at its after()-drained queue so they run on the
+    Tk thread.
+    """
+
+    def __init__(self, db, notify=None):
+        self.db = db
+        self.notify = notify
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, callback=None):
+        """
+        Queue operation() to run on the writer thread. callback, if given,
+        is later called with (result, error) through notify.
+        """
+        self._queue.put((operation, callback))
+
+    def flush(self):
+        """Block until every queued operation has been committed"""
+        self._queue.join()
+
+    def close(self, timeout=None):
+        """Commit everything still queued and stop the writer thread"""
+        self._queue.put(_CLOSE)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            group = [self._queue.get()]
+            while len(group) < MAX_GROUP_SIZE:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            closing = any(item is _CLOSE for item in group)
+            operations = [item for item in group if item is not _CLOSE]
+            try:
+                if operations:
+                    self._apply(operations)
+            finally:
+                for _ in group:
+                    self._queue.task_done()
+            if closing:
+                return
+
+    def _apply(self, operations):
+        results = []
+        try:
+            with self.db.transaction() as conn:
+                if not conn.in_transaction:
+                    conn.execute('BEGIN')
+                for index, (operation, callback) in enumerate(operations):
+                    conn.execute(f'SAVEPOINT op{index}')
+                    try:
+                        result = operation()
+                    except Exception as e:
+                        logger.exception("Queued database write failed: %s", e)
+                        conn.execute(f'ROLLBACK TO op{index}')
+                        results.append((callback, None, e))
+                    else:
+                        results.append((callback, result, None))
+                    conn.execute(f'RELEASE op{index}')
+        except Exception as e:
+            # The commit itself failed, so none of the group was written
+            logger.exception("Group commit of %d writes failed: %s", len(operations), e)
+            results = [(callback, None, e) for _, callback in operations]
+
+        for callback, result, error in results:
+            if callback is None:
+                continue
+            if self.notify:
+                self.notify(lambda c=callback, r=result, e=error: c(r, e))
+            else:
+                callback(result, error)
@@ -1,21 +1,39 @@
+import logging
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
 from .stats_view import StatsView
 from .timer_view import TimerView
+from .task_runner import TaskRunner
 from models.session import SessionTracker
 from datetime import datetime
-from models.browser_monitor import FirefoxMonitor
+from models.services import get_monitor
+
+UI_QUEUE_POLL_MS = 100
+
+logger = logging.getLogger(__name__)
 
 class ProductivityApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Productivity Tracker")
-        self.tracker = SessionTracker()
-        self.monitor = FirefoxMonitor()
+        # Callables queued by worker threads, run on the Tk thread
+        self.ui_calls = queue.Queue()
+        self.tracker = SessionTracker(
+            on_attempts=lambda attempts: self.ui_calls.put(lambda: self.show_live_attempts(attempts)),
+            write_behind=True,
+            notify=self.ui_calls.put,
+        )
+        self.tasks = TaskRunner(self.ui_calls.put, on_busy=self.show_busy)
         
         self.setup_gui()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+    @property
+    def monitor(self):
+        # Built on first use, by whichever task needs it first
+        return get_monitor(self.tracker.db)
+
     def setup_gui(self):
         self.main_frame = ttk.Frame(self.root, padding="10")
         self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -52,25 +70,71 @@ class ProductivityApp:
         )
         self.hosts_unblock_button.grid(row=0, column=5, pady=5)
 
+        # Progress indicator for work running off the Tk thread
+        self.busy_label = ttk.Label(self.main_frame, text="")
+        self.busy_label.grid(row=3, column=0, columnspan=2, sticky=tk.W)
+        self.progress = ttk.Progressbar(self.main_frame, mode='indeterminate', length=200)
+        self.progress.grid(row=3, column=2, columnspan=2, pady=5)
+        self.cancel_button = ttk.Button(self.main_frame, text="Cancel", command=self.tasks.cancel_all)
+        self.cancel_button.grid(row=3, column=4, pady=5)
+        self.show_busy(None)
+
         # Initial status update
         self.update_status()
+        self.drain_ui_calls()
+
+    def drain_ui_calls(self):
+        """Run callbacks handed over by background threads"""
+        try:
+            while True:
+                try:
+                    call = self.ui_calls.get_nowait()
+                except queue.Empty:
+                    break
+                # One failing callback must not stop the ones behind it
+                try:
+                    call()
+                except Exception:
+                    logger.exception("UI callback %r failed", call)
+        finally:
+            self.root.after(UI_QUEUE_POLL_MS, self.drain_ui_calls)
+
+    def show_live_attempts(self, attempts):
+        """Show blocked access attempts as the watcher finds them"""
+        for attempt in attempts:
+            self.status_text.insert(
+                tk.END, f"\n🚫 {attempt.url} at {attempt.visit_time.strftime('%H:%M:%S')}")
+        self.status_text.see(tk.END)
+
+    def on_session_saved(self, result, error):
+        if error:
+            messagebox.showerror("Database Error", f"Failed to save session: {error}")
 
     def start_session(self):
-        self.tracker.start_session()
+        self.tasks.run(
+            lambda token: self.tracker.start_session(callback=self.on_session_saved),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to start session: {e}"),
+            label="Starting session", always_run=True)
         self.timer_view.start_time = datetime.now()
         self.timer_view.timer_running = True
         self.timer_view.update_timer()
 
     def end_session(self):
-        attempts = self.tracker.end_session()  # Capture the return value
         self.timer_view.timer_running = False
         self.timer_view.timer_label.config(text="No active session")
-        
+        self.tasks.run(
+            lambda token: self.tracker.end_session(callback=self.on_session_saved, cancel=token.event),
+            on_done=self.show_session_attempts,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to end session: {e}"),
+            # Cancel only cuts the final scan short; the session is still closed
+            label="Scanning Firefox history", always_run=True)
+
+    def show_session_attempts(self, attempts):
         # Show attempts in a popup if any were detected
         if attempts:
             attempt_text = "Blocked site access attempts:\n\n"
-            for url, time in attempts:
-                attempt_text += f"• {url} at {time.strftime('%H:%M:%S')}\n"
+            for attempt in attempts:
+                attempt_text += f"• {attempt.url} at {attempt.visit_time.strftime('%H:%M:%S')}\n"
             messagebox.showwarning("Access Attempts Detected", attempt_text)
 
     def show_stats(self):
@@ -101,48 +165,73 @@ class ProductivityApp:
 
     def block_sites_hosts(self):
         """Explicitly use hosts-based blocking"""
-        try:
-            self.monitor.hosts_blocker.block_websites()
+        def done(_):
             messagebox.showinfo("Success", "Sites blocked using hosts file")
             self.update_status()
-        except PermissionError:
-            messagebox.showerror(
-                "Administrator Rights Required", 
-                "Please run the application as administrator to modify the hosts file."
-            )
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to block sites: {str(e)}")
+        self.tasks.run(
+            lambda token: self.monitor.hosts_blocker.block_websites(),
+            on_done=done,
+            on_error=lambda e: self.show_hosts_error("block", e),
+            label="Blocking sites")
 
     def unblock_sites_hosts(self):
         """Explicitly use hosts-based unblocking"""
-        try:
-            self.monitor.hosts_blocker.unblock_websites()
+        def done(_):
             messagebox.showinfo("Success", "Sites unblocked from hosts file")
             self.update_status()
-        except PermissionError:
+        self.tasks.run(
+            lambda token: self.monitor.hosts_blocker.unblock_websites(),
+            on_done=done,
+            on_error=lambda e: self.show_hosts_error("unblock", e),
+            label="Unblocking sites")
+
+    def show_hosts_error(self, action, error):
+        if isinstance(error, (PermissionError, SystemExit)):
             messagebox.showerror(
                 "Administrator Rights Required", 
                 "Please run the application as administrator to modify the hosts file."
             )
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to unblock sites: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to {action} sites: {str(error)}")
 
     def update_status(self):
+        self.tasks.run(self.read_blocking_status, on_done=self.show_status,
+                       label="Checking blocking status")
+
+    def read_blocking_status(self, token):
+        """Runs on the task thread; returns the text for the status box"""
         # Update to check both Firefox and hosts status
         firefox_status = self.monitor.check_blocking_status()
+        token.raise_if_cancelled()
         
         # Check hosts status
-        with open(self.monitor.hosts_blocker.hosts_path, 'r') as hosts_file:
-            content = hosts_file.read()
-            hosts_blocked = any(site in content for site in self.monitor.hosts_blocker.blocked_sites)
+        hosts_blocked = self.monitor.hosts_blocker.is_blocked()
         
-        status_text = (
+        return (
             f"Firefox Blocking:\n{firefox_status}\n\n"
             f"Hosts File Blocking: {'🚫 Active' if hosts_blocked else '✅ Inactive'}"
         )
+
+    def show_status(self, status_text):
         self.status_text.delete('1.0', tk.END)
         self.status_text.insert('1.0', status_text)
 
+    def show_busy(self, label):
+        """Progress indicator for the background task runner"""
+        if label:
+            self.busy_label.config(text=f"{label}...")
+            self.progress.grid()
+            self.cancel_button.grid()
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.busy_label.config(text="")
+            self.progress.grid_remove()
+            self.cancel_button.grid_remove()
+
     def on_closing(self):
+        # Finish background work and flush queued session writes
+        self.tasks.shutdown()
+        self.tracker.close()
         self.stats_view.cleanup()
         self.root.destroy()
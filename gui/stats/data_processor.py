@@ -1,37 +1,63 @@
-import sqlite3
-from datetime import datetime
+from datetime import date, timedelta
+import pandas as pd
+from dateutil import tz
+
+# pandas offset aliases for each supported grouping
+GRANULARITIES = {
+    'day': 'D',
+    'week': 'W-SUN',  # Weeks run Monday to Sunday
+    'month': 'M',
+}
+
 
 class SessionDataProcessor:
-    def __init__(self, db_path):
-        self.db_path = db_path
-        
-    def get_session_data(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT 
-                date,
-                start_time,
-                duration
-            FROM productive_sessions 
-            WHERE date >= date('now', '-7 days')
-                AND duration IS NOT NULL
-            ORDER BY date, start_time
-        ''')
-        
-        results = c.fetchall()
-        conn.close()
-        
-        if not results:
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def _date_range(start, end):
+        """ISO bounds for a range; the default is the last 7 days"""
+        end = end or date.today()
+        start = start or end - timedelta(days=7)
+        return str(start), str(end)
+
+    def get_session_data(self, start=None, end=None):
+        """
+        Completed sessions between start and end (dates or ISO strings) as
+        a DataFrame with date, start (local datetime) and duration
+        columns, or None if there are none. Parsing is done column-wise,
+        so a year of sessions costs about the same as a week.
+        """
+        frame = self.db.read_sessions_frame(*self._date_range(start, end))
+        if frame.empty:
             return None
-            
-        # Process the data
-        sessions_by_date = {}
-        for date, start_time, duration in results:
-            if date not in sessions_by_date:
-                sessions_by_date[date] = []
-            start_hour = datetime.strptime(start_time, '%Y-%m-%d %H:%M:%S.%f').strftime('%H:%M')
-            sessions_by_date[date].append((start_hour, duration))
-            
-        return sessions_by_date 
\ No newline at end of file
+
+        frame['start'] = (pd.to_datetime(frame.pop('start_time'), unit='us', utc=True)
+                          .dt.tz_convert(tz.tzlocal())
+                          .dt.tz_localize(None))
+        return frame
+
+    def get_totals(self, start=None, end=None, granularity='day'):
+        """
+        Sessions and minutes per day, week or month between start and end,
+        aggregated from daily_rollup. Returns a DataFrame indexed by the
+        first day of each period, or None if there is no data.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity!r}, "
+                             f"expected one of {', '.join(GRANULARITIES)}")
+
+        frame = self.db.read_rollup_frame(*self._date_range(start, end))
+        if frame.empty:
+            return None
+
+        frame.index = pd.to_datetime(frame.pop('date'))
+        periods = frame.index.to_period(GRANULARITIES[granularity]).start_time
+        totals = frame.groupby(periods).agg(
+            sessions=('session_count', 'sum'),
+            minutes=('total_minutes', 'sum'),
+            shortest=('min_minutes', 'min'),
+            longest=('max_minutes', 'max'),
+        )
+        totals.index.name = 'period'
+        return totals
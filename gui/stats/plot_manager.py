@@ -1,46 +1,173 @@
+import math
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+BAR_WIDTH = 0.15
+# Above these counts the plot switches to a coarser mode, so the number
+# of artists stays bounded whatever the date range
+MAX_SESSION_BARS = 60
+MAX_PERIOD_BARS = 120
+MAX_TICK_LABELS = 20
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+PLOT_MODES = ('sessions', 'daily', 'weekly', 'heatmap')
+
+
+def _session_days(sessions):
+    return np.asarray(sessions['date'], dtype='datetime64[D]')
+
+
+def _week_starts(days):
+    # 1970-01-01 was a Thursday, so (day + 3) % 7 is 0 on Mondays
+    return days - (days.astype(np.int64) + 3) % 7
+
+
+def choose_plot_mode(sessions):
+    """Finest mode whose bar count stays within the limits above"""
+    if len(sessions) <= MAX_SESSION_BARS:
+        return 'sessions'
+    days = np.unique(_session_days(sessions))
+    if len(days) <= MAX_PERIOD_BARS:
+        return 'daily'
+    if len(np.unique(_week_starts(days))) <= MAX_PERIOD_BARS:
+        return 'weekly'
+    return 'heatmap'
+
 
 class SessionPlotManager:
+    """
+    Owns one figure for the lifetime of the stats view. Refreshing in the
+    same mode with the same number of bars updates the existing artists
+    in place; the axes are only rebuilt when the mode or bar count changes.
+    """
+
     def __init__(self):
         self.current_figure = None
-        
-    def create_session_plot(self, sessions_by_date):
-        if self.current_figure:
-            plt.close(self.current_figure)
-            
-        self.current_figure = plt.figure(figsize=(10, 6))
-        ax = self.current_figure.add_subplot(111)
-        
-        x_positions = []
-        heights = []
-        x_labels = []
-        
-        for i, (date, sessions) in enumerate(sessions_by_date.items()):
-            for j, (start_time, duration) in enumerate(sessions):
-                x_positions.append(i + j * 0.2)
-                heights.append(duration)
-                x_labels.append(f"{date}\n{start_time}")
-        
-        bars = ax.bar(x_positions, heights, width=0.15)
-        
-        self._customize_plot(ax, x_positions, x_labels, bars)
-        plt.tight_layout()
+        self.ax = None
+        self.mode = None
+        self.bars = None
+        self.bar_labels = []
+        self.image = None
+
+    def create_session_plot(self, sessions, mode=None):
+        """
+        Draw sessions (the DataFrame from SessionDataProcessor) and return
+        the figure, which is the same object on every call. mode is one of
+        PLOT_MODES; by default it is picked from the number of sessions.
+        """
+        if self.current_figure is None:
+            self.current_figure = plt.figure(figsize=(10, 6))
+        mode = mode or choose_plot_mode(sessions)
+
+        if mode == 'heatmap':
+            self._plot_heatmap(sessions)
+        else:
+            x_positions, heights, x_labels = self._bar_data(sessions, mode)
+            if mode == self.mode and self.bars is not None and len(self.bars) == len(heights):
+                self._update_bars(x_positions, heights, x_labels)
+            else:
+                self._rebuild(mode, x_positions, heights, x_labels)
         
         return self.current_figure
+
+    def _bar_data(self, sessions, mode):
+        durations = sessions['duration'].to_numpy()
+        if mode == 'sessions':
+            # Sessions of the same day sit next to each other around its slot
+            day_index, _ = pd.factorize(sessions['date'])
+            x_positions = day_index + sessions.groupby('date').cumcount().to_numpy() * 0.2
+            x_labels = (sessions['date'] + '\n' + sessions['start'].dt.strftime('%H:%M')).tolist()
+            return x_positions, durations, x_labels
+
+        days = _session_days(sessions)
+        keys = days if mode == 'daily' else _week_starts(days)
+        periods, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse, weights=durations, minlength=len(periods))
+        x_labels = [str(p) for p in periods]
+        return np.arange(len(periods), dtype=float), totals, x_labels
+
+    def _clear(self, mode):
+        self.current_figure.clear()
+        self.ax = self.current_figure.add_subplot(111)
+        self.mode = mode
+        self.bars = None
+        self.bar_labels = []
+        self.image = None
+
+    def _rebuild(self, mode, x_positions, heights, x_labels):
+        self._clear(mode)
+        width = BAR_WIDTH if mode == 'sessions' else 0.8
+        self.bars = self.ax.bar(x_positions, heights, width=width)
+        self._customize_plot(self.ax, x_positions, x_labels, self.bars)
+        self.current_figure.tight_layout()
+
+    def _update_bars(self, x_positions, heights, x_labels):
+        width = self.bars[0].get_width() if len(self.bars) else BAR_WIDTH
+        for bar, x, height in zip(self.bars, x_positions, heights):
+            bar.set_x(x - width / 2)
+            bar.set_height(height)
+        for label, x, height in zip(self.bar_labels, x_positions, heights):
+            label.set_position((x, height))
+            label.set_text(f'{int(height)}m')
+        self._set_ticks(self.ax, x_positions, x_labels)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    @staticmethod
+    def _set_ticks(ax, x_positions, x_labels):
+        step = max(1, math.ceil(len(x_labels) / MAX_TICK_LABELS))
+        ax.set_xticks(x_positions[::step], x_labels[::step], rotation=45, ha='right')
         
     def _customize_plot(self, ax, x_positions, x_labels, bars):
-        ax.set_title('Individual Sessions by Day')
-        ax.set_xlabel('Date and Start Time')
+        titles = {
+            'sessions': ('Individual Sessions by Day', 'Date and Start Time'),
+            'daily': ('Productive Time per Day', 'Date'),
+            'weekly': ('Productive Time per Week', 'Week starting'),
+        }
+        title, xlabel = titles[self.mode]
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
         ax.set_ylabel('Duration (minutes)')
         
-        plt.xticks(x_positions, x_labels, rotation=45, ha='right')
+        self._set_ticks(ax, x_positions, x_labels)
         
+        # Aggregated modes skip per-bar labels to keep the artist count low
+        if self.mode != 'sessions':
+            return
         for bar in bars:
             height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{int(height)}m',
-                   ha='center', va='bottom')
+            self.bar_labels.append(ax.text(
+                bar.get_x() + bar.get_width()/2., height,
+                f'{int(height)}m',
+                ha='center', va='bottom'))
+
+    def _plot_heatmap(self, sessions):
+        """Minutes by weekday and start hour, drawn as one image"""
+        starts = sessions['start']
+        grid = np.zeros((7, 24))
+        np.add.at(grid, (starts.dt.weekday.to_numpy(), starts.dt.hour.to_numpy()),
+                  sessions['duration'].to_numpy())
+
+        if self.mode == 'heatmap' and self.image is not None:
+            self.image.set_data(grid)
+            self.image.set_clim(0, max(grid.max(), 1))
+            return
+
+        self._clear('heatmap')
+        self.image = self.ax.imshow(grid, aspect='auto', cmap='Greens',
+                                    vmin=0, vmax=max(grid.max(), 1))
+        self.ax.set_title('Productive Time by Weekday and Start Hour')
+        self.ax.set_xlabel('Hour of day')
+        self.ax.set_yticks(range(7), WEEKDAYS)
+        self.ax.set_xticks(range(0, 24, 2))
+        self.current_figure.colorbar(self.image, ax=self.ax, label='Minutes')
+        self.current_figure.tight_layout()
                    
     def cleanup(self):
         if self.current_figure:
-            plt.close(self.current_figure) 
\ No newline at end of file
+            plt.close(self.current_figure)
+            self.current_figure = None
+            self.mode = None
+            self.bars = None
+            self.image = None
@@ -1,8 +1,12 @@
+import logging
+from datetime import date, timedelta
 import tkinter as tk
 from tkinter import ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from .stats.data_processor import SessionDataProcessor
-from .stats.plot_manager import SessionPlotManager
+
+logger = logging.getLogger(__name__)
+
+# Days shown for each range choice; None means all recorded sessions
+STATS_RANGES = {'Week': 7, 'Month': 31, 'Year': 365, 'All': None}
 
 class StatsView:
     def __init__(self, parent, session_tracker):
@@ -10,26 +14,47 @@ class StatsView:
         self.stats_frame = ttk.Frame(parent)
         self.stats_frame.grid(row=1, column=0, columnspan=3, pady=10)
         
-        self.data_processor = SessionDataProcessor(session_tracker.db.db_path)
-        self.plot_manager = SessionPlotManager()
+        self.db = session_tracker.db
+        # pandas and matplotlib are imported on the first show_stats call,
+        # so they stay out of the startup path
+        self.data_processor = None
+        self.plot_manager = None
+        self.canvas = None
+
+        self.range_var = tk.StringVar(value='Week')
+        self.range_box = ttk.Combobox(self.stats_frame, textvariable=self.range_var,
+                                      values=list(STATS_RANGES), state='readonly', width=8)
+        self.range_box.grid(row=1, column=0, sticky=tk.W)
+        self.range_box.bind('<<ComboboxSelected>>', lambda event: self.show_stats())
         
+    def _load_plotting(self):
+        from .stats.data_processor import SessionDataProcessor
+        from .stats.plot_manager import SessionPlotManager
+        self.data_processor = SessionDataProcessor(self.db)
+        self.plot_manager = SessionPlotManager()
+
     def show_stats(self):
-        sessions_by_date = self.data_processor.get_session_data()
+        if self.plot_manager is None:
+            self._load_plotting()
+        days = STATS_RANGES[self.range_var.get()]
+        start = date.today() - timedelta(days=days) if days else date.min
+        sessions = self.data_processor.get_session_data(start)
         
-        if not sessions_by_date:
-            print("No completed sessions found yet")
+        if sessions is None:
+            logger.info("No completed sessions found yet")
             return
             
-        figure = self.plot_manager.create_session_plot(sessions_by_date)
-        
-        # Clear previous widgets
-        for widget in self.stats_frame.winfo_children():
-            widget.destroy()
+        figure = self.plot_manager.create_session_plot(sessions)
         
-        # Embed in tkinter
-        canvas = FigureCanvasTkAgg(figure, master=self.stats_frame)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=0, column=0)
+        # Embed in tkinter once, later refreshes only redraw
+        if self.canvas is None or self.canvas.figure is not figure:
+            if self.canvas is not None:
+                self.canvas.get_tk_widget().destroy()
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(figure, master=self.stats_frame)
+            self.canvas.get_tk_widget().grid(row=0, column=0)
+        self.canvas.draw_idle()
         
     def cleanup(self):
-        self.plot_manager.cleanup()
+        if self.plot_manager is not None:
+            self.plot_manager.cleanup()
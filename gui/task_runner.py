@@ -0,0 +1,104 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Handed to every task; long-running work polls it between steps"""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        self.event.set()
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise TaskCancelled()
+
+
+class TaskRunner:
+    """
+    Runs monitor and blocker work off the Tk main thread.
+
+    Tasks execute one at a time on a worker thread, in submission order,
+    so a session end can never race the next session start. Results and
+    errors are handed to notify (the app's queue drained by after()), so
+    on_done/on_error always run on the Tk thread. on_busy is called the
+    same way with the label of the running task, or None when idle.
+    """
+
+    def __init__(self, notify, on_busy=None):
+        self.notify = notify
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gui-task')
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def run(self, func, on_done=None, on_error=None, label=None, always_run=False):
+        """
+        Queue func(token); return its CancelToken. A cancelled task is
+        skipped unless always_run is set: such tasks (session starts and
+        ends) still run and report back, and only take the cancelled
+        token as a cue to cut optional work like a history scan short.
+        """
+        token = CancelToken()
+        with self._lock:
+            self._pending.append(token)
+        self._executor.submit(self._execute, func, token, on_done, on_error, label, always_run)
+        return token
+
+    def cancel_all(self):
+        with self._lock:
+            for token in self._pending:
+                token.cancel()
+
+    @property
+    def busy(self):
+        with self._lock:
+            return bool(self._pending)
+
+    def shutdown(self, cancel=True):
+        """
+        Wait for the worker; queued tasks are cancelled unless cancel=False.
+        Tasks queued with always_run still run.
+        """
+        if cancel:
+            self.cancel_all()
+        self._executor.shutdown(wait=True)
+
+    def _execute(self, func, token, on_done, on_error, label, always_run):
+        self._report_busy(label)
+        try:
+            if token.cancelled and not always_run:
+                raise TaskCancelled()
+            result = func(token)
+        except TaskCancelled:
+            logger.info("Task %s cancelled", label or func)
+        except (Exception, SystemExit) as e:
+            logger.exception("Task %s failed: %s", label or func, e)
+            if on_error:
+                self.notify(lambda error=e: on_error(error))
+        else:
+            if on_done and (always_run or not token.cancelled):
+                self.notify(lambda: on_done(result))
+        finally:
+            with self._lock:
+                self._pending.remove(token)
+                idle = not self._pending
+            if idle:
+                self._report_busy(None)
+
+    def _report_busy(self, label):
+        if self.on_busy:
+            self.notify(lambda: self.on_busy(label))
@@ -1,21 +1,66 @@
+import time
+_PROCESS_START = time.perf_counter()
+
+import os
 import sys
-import tkinter as tk
-from gui.app import ProductivityApp
-from models.browser_monitor import FirefoxMonitor
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+def startup_report(module="gui.app", limit=15):
+    """
+    Import module in a fresh interpreter under -X importtime and print the
+    slowest imports by cumulative time, as a quick check that nothing
+    heavy has crept back into the startup path.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # The header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    if result.returncode:
+        print(result.stderr.strip().splitlines()[-1])
+
+    total = sum(cumulative for cumulative, _, depth, _ in rows if depth == 0)
+    print(f"Importing {module} took {total / 1000:.1f} ms ({len(rows)} modules)")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, self_us, _, name in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+
+
+def run_gui():
+    import tkinter as tk
+    from gui.app import ProductivityApp
+
+    root = tk.Tk()
+    app = ProductivityApp(root)
+    root.after_idle(lambda: logger.info(
+        "First window after %.0f ms", (time.perf_counter() - _PROCESS_START) * 1000))
+    root.mainloop()
+
 
 if __name__ == "__main__":
-    # Check if running in unblock mode
-    if len(sys.argv) > 1 and sys.argv[1] == "unblock":
-        print("Unblocking all sites...")
-        monitor = FirefoxMonitor()
-        success = monitor.unblock_sites()
-        if success:
-            print("Sites unblocked successfully!")
-        else:
-            print("Failed to unblock sites. Please check the error messages above.")
-        input("Press Enter to exit...")
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--startup-report":
+        startup_report()
+    elif len(sys.argv) > 1:
+        # Headless commands (start, end, scan, status, block, unblock, stats)
+        from cli import main
+        sys.exit(main(sys.argv[1:]))
     else:
         # Normal app startup
-        root = tk.Tk()
-        app = ProductivityApp(root)
-        root.mainloop()
+        run_gui()
@@ -0,0 +1,91 @@
+import os
+import threading
+
+# Seconds between stat() polls while the browser is active
+DEFAULT_POLL_INTERVAL = 2.0
+# Longest wait between polls once the history has been idle for a while
+DEFAULT_MAX_POLL_INTERVAL = 30.0
+BACKOFF_FACTOR = 2.0
+
+
+class BlockedAccessWatcher:
+    """
+    Background thread that watches the Firefox history files during a
+    session. Polling is only a stat() of places.sqlite and its -wal file;
+    an incremental scan runs only when one of them changes, and the poll
+    interval backs off while the browser is idle.
+    """
+
+    def __init__(self, monitor, start_time, on_attempts,
+                 poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_poll_interval=DEFAULT_MAX_POLL_INTERVAL):
+        self.monitor = monitor
+        self.start_time = start_time
+        self.on_attempts = on_attempts
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(max_poll_interval, poll_interval)
+        self._last_signature = None
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='blocked-access-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _signature(self):
+        signature = []
+        for places_path in self.monitor.profile_paths:
+            for path in (places_path, places_path + '-wal'):
+                try:
+                    st = os.stat(path)
+                    signature.append((st.st_mtime_ns, st.st_size))
+                except OSError:
+                    signature.append(None)
+        return tuple(signature)
+
+    def scan_if_changed(self, cancel=None):
+        """
+        Scan new history if the files changed since the last scan. Setting
+        the cancel event stops the scan early; the unread visits are then
+        picked up by the next scan.
+        """
+        with self._scan_lock:
+            signature = self._signature()
+            if signature == self._last_signature:
+                return []
+            attempts = []
+            scan = self.monitor.iter_blocked_access(self.start_time)
+            for attempt in scan:
+                if cancel is not None and cancel.is_set():
+                    scan.close()
+                    break
+                attempts.append(attempt)
+            else:
+                self._last_signature = signature
+        if attempts:
+            self.on_attempts(attempts)
+        return attempts
+
+    def _run(self):
+        interval = self.poll_interval
+        try:
+            while not self._stop.is_set():
+                changed = self._signature() != self._last_signature
+                if changed:
+                    self.scan_if_changed()
+                    interval = self.poll_interval
+                else:
+                    interval = min(interval * BACKOFF_FACTOR, self.max_poll_interval)
+                self._stop.wait(interval)
+        finally:
+            # A new watcher thread runs per session; don't leave its
+            # connections open behind it
+            self.monitor.release_thread_connections()
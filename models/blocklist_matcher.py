@@ -0,0 +1,150 @@
+from collections import deque
+from urllib.parse import urlsplit
+from .config.blocked_sites import BLOCKED_SITES
+from .blocklist_store import BlocklistStore
+
+_END = ''  # Trie key marking the end of a blocked host (labels are never empty)
+
+
+def split_blocked_sites(sites):
+    """
+    Split blocklist entries into normalized host rules and substring rules.
+    'https://www.youtube.com/' becomes the host 'youtube.com' (which also
+    covers its subdomains), while path rules such as '/r/' stay substrings.
+    """
+    hosts = set()
+    patterns = set()
+    for site in sites:
+        site = site.strip().lower()
+        if not site:
+            continue
+        if site.startswith('/'):
+            patterns.add(site)
+            continue
+        site = site.replace('https://', '').replace('http://', '')
+        host, _, path = site.partition('/')
+        if host.startswith('www.'):
+            host = host[4:]
+        if path:
+            patterns.add(f"{host}/{path}")
+        elif host:
+            hosts.add(host)
+    return hosts, patterns
+
+
+def url_host(url):
+    """Lowercase host of a URL or of a bare 'example.com/path' entry"""
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        host = urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+    return host.rstrip('.')
+
+
+class _AhoCorasick:
+    """Multi-pattern substring search in a single pass over the text"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [False]
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(False)
+                state = nxt
+            self._out[state] = True
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+
+    def search(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+class BlocklistMatcher:
+    """
+    Compiled form of a blocklist. Host rules live in a trie keyed by
+    reversed labels, so a lookup costs one step per label of the visited
+    host; substring rules are matched by one Aho-Corasick pass over the
+    URL. Neither depends on the number of rules.
+
+    store, if given, is a BlocklistStore of imported lists; hosts not in
+    the trie are looked up there.
+    """
+
+    def __init__(self, sites, store=None):
+        self.hosts, self.patterns = split_blocked_sites(sites)
+        self.store = store
+        self._trie = {}
+        for host in self.hosts:
+            node = self._trie
+            for label in reversed(host.split('.')):
+                node = node.setdefault(label, {})
+            node[_END] = True
+        self._automaton = _AhoCorasick(self.patterns)
+
+    def host_blocked(self, host):
+        """True if host or one of its parent domains is blocked"""
+        node = self._trie
+        for label in reversed(host.lower().rstrip('.').split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            if _END in node:
+                return True
+        return self.has_imported_hosts() and self.store.host_blocked(host)
+
+    def has_imported_hosts(self):
+        return self.store is not None and bool(self.store)
+
+    def matches(self, url):
+        lowered = url.lower()
+        return self.host_blocked(url_host(lowered)) or self._automaton.search(lowered)
+
+    def host_entries(self):
+        """Sorted hostnames to redirect in a hosts file (bare and www.)"""
+        return sorted({name for host in self.hosts for name in (host, f"www.{host}")})
+
+    def imported_host_entries(self):
+        """Hostnames from imported lists, streamed from the store"""
+        return self.store.iter_hosts() if self.has_imported_hosts() else iter(())
+
+
+_default_matcher = None
+
+
+def get_default_matcher():
+    """
+    Matcher for models/config/blocked_sites.py plus any imported lists,
+    built once and shared. The store is only opened on first lookup.
+    """
+    global _default_matcher
+    if _default_matcher is None:
+        store = BlocklistStore()
+        _default_matcher = BlocklistMatcher(BLOCKED_SITES, store if store.exists() else None)
+    return _default_matcher
@@ -0,0 +1,278 @@
+"""
+On-disk store for large imported blocklists.
+
+Community lists (hosts files such as StevenBlack's, or one domain per
+line) run to hundreds of thousands of domains. Rather than holding them
+as Python strings, they are streamed into a SQLite table keyed by the
+reversed host in Firefox's rev_host form ('moc.elpmaxe.') and declared
+WITHOUT ROWID, so the rows are the B-tree itself and are kept sorted.
+A lookup is one indexed probe per label of the host being checked.
+There is one row per (domain, list), so a domain stays blocked for as
+long as any imported list still has it.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from itertools import islice
+from urllib.request import pathname2url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = 'blocklist.db'
+IMPORT_CHUNK_SIZE = 10000
+# Bound parameters per IN (...) lookup, well under SQLite's limit
+LOOKUP_CHUNK_SIZE = 500
+
+_HOSTNAME = re.compile(r'^[a-z0-9_-]+(\.[a-z0-9_-]+)+$')
+# Names hosts files map for the machine itself rather than to block
+_LOCAL_NAMES = {'localhost.localdomain', 'ip6-localhost', 'ip6-loopback',
+                'ip6-localnet', 'ip6-mcastprefix', 'ip6-allnodes',
+                'ip6-allrouters', 'ip6-allhosts', 'broadcasthost'}
+
+
+def reverse_host(host):
+    """Firefox's moz_places.rev_host form: 'www.a.com' -> 'moc.a.www.'"""
+    return host[::-1] + '.'
+
+
+def normalize_domain(name):
+    """Lowercase ASCII hostname, or None if name isn't a usable domain"""
+    name = name.lower().rstrip('.')
+    if not name.isascii():
+        try:
+            name = name.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    if len(name) > 253 or not _HOSTNAME.match(name) or name in _LOCAL_NAMES:
+        return None
+    if name[-1].isdigit() and name.rsplit('.', 1)[1].isdigit():
+        return None  # An IPv4 address, not a name
+    return name
+
+
+def parse_blocklist_line(line):
+    """
+    Domains listed on one line of a hosts-format, plain-domain or simple
+    Adblock ('||example.com^') list.
+    """
+    if '#' in line:
+        line = line.split('#', 1)[0]
+    fields = line.split()
+    if not fields or fields[0][0] in '![':
+        return []
+    if fields[0].startswith('||'):
+        fields = [fields[0][2:].split('^', 1)[0]]
+    elif len(fields) > 1 and (':' in fields[0] or fields[0][0].isdigit()):
+        # 'address name [name...]' in hosts format
+        fields = fields[1:]
+    domains = []
+    for field in fields:
+        domain = normalize_domain(field)
+        if domain:
+            domains.append(domain)
+    return domains
+
+
+def iter_blocklist_domains(path):
+    """Stream the normalized domains of a blocklist file"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as blocklist:
+        for line in blocklist:
+            yield from parse_blocklist_line(line)
+
+
+def _rev_host_prefixes(rev_host):
+    """'moc.a.www.' -> ['moc.', 'moc.a.', 'moc.a.www.']: the host and its parents"""
+    return [rev_host[:i + 1] for i, ch in enumerate(rev_host) if ch == '.']
+
+
+class BlocklistStore:
+    """
+    Imported domains in a SQLite file. Nothing is opened until the first
+    lookup; readers get one read-only connection per thread.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._count = None
+        self._any = None
+
+    def _writer(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS blocklist_sources (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                imported_at INTEGER,
+                domain_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        pk_columns = [row[1] for row in conn.execute('PRAGMA table_info(blocked_hosts)') if row[5]]
+        if pk_columns == ['rev_host']:
+            self._migrate_to_memberships(conn)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS blocked_hosts (
+                rev_host TEXT NOT NULL,
+                source_id INTEGER NOT NULL,
+                PRIMARY KEY (rev_host, source_id)
+            ) WITHOUT ROWID
+        ''')
+        return conn
+
+    @staticmethod
+    def _migrate_to_memberships(conn):
+        """
+        Stores written before memberships kept each domain under the first
+        list that had it; those rows carry over as they are, and a shared
+        domain gains its other lists when they are re-imported.
+        """
+        logger.info("Migrating blocklist store to per-list memberships")
+        with conn:
+            # DDL doesn't open a transaction implicitly
+            conn.execute('BEGIN')
+            conn.execute('ALTER TABLE blocked_hosts RENAME TO blocked_hosts_old')
+            conn.execute('''
+                CREATE TABLE blocked_hosts (
+                    rev_host TEXT NOT NULL,
+                    source_id INTEGER NOT NULL,
+                    PRIMARY KEY (rev_host, source_id)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('INSERT INTO blocked_hosts (rev_host, source_id) '
+                         'SELECT rev_host, source_id FROM blocked_hosts_old')
+            conn.execute('DROP TABLE blocked_hosts_old')
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def import_file(self, path):
+        """
+        Stream the blocklist at path into the store, replacing whatever an
+        earlier import of the same file added. Domains other lists also
+        have are kept for them. Returns the number of domains in the list.
+        """
+        source = os.path.abspath(path)
+        started = time.perf_counter()
+        conn = self._writer()
+        try:
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO blocklist_sources (path) VALUES (?)', (source,))
+                source_id = conn.execute('SELECT id FROM blocklist_sources WHERE path = ?',
+                                         (source,)).fetchone()[0]
+                conn.execute('DELETE FROM blocked_hosts WHERE source_id = ?', (source_id,))
+                before = conn.total_changes
+                domains = iter_blocklist_domains(path)
+                while True:
+                    # Sorted chunks append to the B-tree in runs instead of
+                    # splitting pages all over it
+                    chunk = sorted({reverse_host(d) for d in islice(domains, IMPORT_CHUNK_SIZE)})
+                    if not chunk:
+                        break
+                    conn.executemany(
+                        'INSERT OR IGNORE INTO blocked_hosts (rev_host, source_id) VALUES (?, ?)',
+                        ((rev_host, source_id) for rev_host in chunk))
+                added = conn.total_changes - before
+                conn.execute('UPDATE blocklist_sources SET imported_at = ?, domain_count = ? '
+                             'WHERE id = ?', (int(time.time()), added, source_id))
+        finally:
+            conn.close()
+        self._count = self._any = None
+        logger.info("Imported %d domains from %s in %.1f s", added, path,
+                    time.perf_counter() - started)
+        return added
+
+    def clear(self):
+        """Forget every imported list"""
+        conn = self._writer()
+        try:
+            with conn:
+                conn.execute('DELETE FROM blocked_hosts')
+                conn.execute('DELETE FROM blocklist_sources')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+        self._count = 0
+        self._any = False
+
+    def sources(self):
+        """(path, imported_at, domain_count) of each imported list"""
+        return self._reader().execute(
+            'SELECT path, imported_at, domain_count FROM blocklist_sources ORDER BY path'
+        ).fetchall()
+
+    def __len__(self):
+        """Distinct imported domains, however many lists have them"""
+        if self._count is None:
+            self._count = self._reader().execute(
+                'SELECT COUNT(DISTINCT rev_host) FROM blocked_hosts').fetchone()[0]
+        return self._count
+
+    def __bool__(self):
+        # Matchers ask this on every lookup; one probe answers it, where
+        # len() has to count every distinct domain
+        if self._any is None:
+            self._any = bool(self._reader().execute(
+                'SELECT EXISTS (SELECT 1 FROM blocked_hosts)').fetchone()[0])
+        return self._any
+
+    def blocked_rev_hosts(self, rev_hosts):
+        """
+        The subset of rev_hosts (rev_host form) that are blocked, either
+        directly or through a parent domain.
+        """
+        prefixes = {rev_host: _rev_host_prefixes(rev_host) for rev_host in set(rev_hosts)}
+        candidates = list({p for parts in prefixes.values() for p in parts})
+        hits = set()
+        conn = self._reader()
+        for i in range(0, len(candidates), LOOKUP_CHUNK_SIZE):
+            chunk = candidates[i:i + LOOKUP_CHUNK_SIZE]
+            hits.update(row[0] for row in conn.execute(
+                'SELECT DISTINCT rev_host FROM blocked_hosts WHERE rev_host IN (%s)'
+                % ','.join('?' * len(chunk)), chunk))
+        return {rev_host for rev_host, parts in prefixes.items() if not hits.isdisjoint(parts)}
+
+    def host_blocked(self, host):
+        host = host.lower().rstrip('.')
+        return bool(host) and bool(self.blocked_rev_hosts([reverse_host(host)]))
+
+    def iter_hosts(self):
+        """Every imported hostname, in rev_host order"""
+        # The primary key's order, so this costs no sort; the hosts file
+        # section digest relies on it being stable
+        for (rev_host,) in self._reader().execute(
+                'SELECT DISTINCT rev_host FROM blocked_hosts ORDER BY rev_host'):
+            yield rev_host[-2::-1]
+
+    def release_reader(self):
+        """Close the calling thread's reader connection, if it has one"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._readers_lock:
+            if conn in self._readers:
+                self._readers.remove(conn)
+        conn.close()
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+        self._local = threading.local()
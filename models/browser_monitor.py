@@ -1,109 +1,448 @@
-import sqlite3
 import os
 from datetime import datetime
 import platform
+import logging
+import time
+import configparser
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import Counter, namedtuple
 from .hosts_blocker import WebsiteBlocker
 from .config.blocked_sites import BLOCKED_SITES
 from .firefox_blocker import FirefoxBlocker
+from .places_snapshot import places_reader
+from .blocklist_matcher import get_default_matcher
+from .blocklist_store import reverse_host
+from database.activity_db import ActivityDatabase
+
+
+# Rows pulled from the history cursor per fetchmany call
+SCAN_BATCH_SIZE = 500
+# Upper bound on profiles scanned at the same time
+MAX_SCAN_WORKERS = 8
+# How often a worker blocked on a full result queue checks for a stop
+_PUT_POLL_SECONDS = 0.1
+
+# Ways block_sites can enforce the blocklist
+BLOCKING_BACKENDS = ('auto', 'firefox', 'hosts', 'dns')
+
+# A blocked visit; (profile, visit_id) identifies it across scans
+BlockedAttempt = namedtuple('BlockedAttempt', 'url visit_time profile visit_id')
+# Sent by a scan worker after its last attempt; cursor is the
+# (max_visit_id, max_visit_date) to store, or None if the scan failed
+_ProfileDone = namedtuple('_ProfileDone', 'places_path cursor')
+
+logger = logging.getLogger(__name__)
+
 
 class FirefoxMonitor:
-    def __init__(self):
-        self.firefox_path = self._get_firefox_profile_path()
-        self.hosts_blocker = WebsiteBlocker()
+    def __init__(self, db=None):
+        self.db = db if db is not None else ActivityDatabase()
+        self.profile_paths = self._get_firefox_profile_paths()
         self.blocked_sites = BLOCKED_SITES
-        self.firefox_blocker = FirefoxBlocker(self.firefox_path, self.blocked_sites)
+        self.matcher = get_default_matcher()
+        self.hosts_blocker = WebsiteBlocker(self.matcher)
+        self.firefox_blocker = FirefoxBlocker(self.firefox_path, self.blocked_sites, self.matcher)
         
-        print(f"Firefox profile path: {self.firefox_path}")
+        # Set by block_sites(backend='dns'); the listen address must be the
+        # one the system resolver is configured to use. A None listen
+        # address means the sinkhole's default, resolved when it starts so
+        # that importing the monitor doesn't import asyncio. The upstream
+        # has no default and must be set before the sinkhole can start
+        self.dns_sinkhole = None
+        self.dns_listen = None
+        self.dns_upstream = None
+
+        self.scan_stats = Counter()
+        self._stats_lock = threading.Lock()
+        # Long-lived, so the per-thread connections its workers open (to
+        # the blocklist store) are reused across scans instead of piling up
+        self._scan_pool = ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS,
+                                             thread_name_prefix='firefox-scan')
         
-    def _get_firefox_profile_path(self):
+        logger.info("Firefox profile path: %s", self.firefox_path)
+        if len(self.profile_paths) > 1:
+            logger.info("Monitoring %d Firefox profiles", len(self.profile_paths))
+
+    @property
+    def firefox_path(self):
+        """places.sqlite of the default profile, used for blocking"""
+        return self.profile_paths[0] if self.profile_paths else None
+
+    @firefox_path.setter
+    def firefox_path(self, path):
+        # Pointing the monitor at one database restricts scans to it
+        self.profile_paths = [path] if path else []
+        
+    def _get_firefox_profiles_dir(self):
         if platform.system() == "Windows":
-            path = os.path.expandvars(r"%APPDATA%\Mozilla\Firefox\Profiles")
-        else:  # macOS and Linux
-            path = os.path.expanduser("~/Library/Application Support/Firefox/Profiles")
-            
-        # Get the default profile (usually ends with .default-release)
+            return os.path.expandvars(r"%APPDATA%\Mozilla\Firefox\Profiles")
+        elif platform.system() == "Darwin":
+            return os.path.expanduser("~/Library/Application Support/Firefox/Profiles")
+        else:  # Linux keeps profiles directly in ~/.mozilla/firefox
+            return os.path.expanduser("~/.mozilla/firefox")
+
+    def _get_firefox_profile_paths(self):
+        """
+        Return places.sqlite for every Firefox profile, default first.
+        Profiles come from profiles.ini when present, otherwise from the
+        directory listing.
+        """
+        path = self._get_firefox_profiles_dir()
+        for ini_dir in (path, os.path.dirname(path)):
+            ini_path = os.path.join(ini_dir, 'profiles.ini')
+            if os.path.isfile(ini_path):
+                profiles = self._read_profiles_ini(ini_path)
+                if profiles:
+                    return profiles
+
         try:
-            profiles = os.listdir(path)
-            default_profile = next(p for p in profiles if p.endswith('default-release'))
-            return os.path.join(path, default_profile, 'places.sqlite')
-        except (FileNotFoundError, StopIteration):
-            print("Firefox profile not found")
-            return None
-            
-    def check_blocked_access(self, start_time):
-        print(f"Checking for blocked access since: {start_time}")
-        
-        if not self.firefox_path or not os.path.exists(self.firefox_path):
-            print("Firefox profile not found or inaccessible")
-            return []
-            
-        attempts = []
+            profiles = sorted(os.listdir(path), key=lambda p: not p.endswith('default-release'))
+        except FileNotFoundError:
+            profiles = []
+        paths = [
+            os.path.join(path, p, 'places.sqlite') for p in profiles
+            if p.endswith('default-release')
+            or os.path.exists(os.path.join(path, p, 'places.sqlite'))
+        ]
+        if not paths:
+            logger.warning("Firefox profile not found")
+        return paths
+
+    def _read_profiles_ini(self, ini_path):
+        parser = configparser.ConfigParser(interpolation=None)
         try:
-            # Create a copy of places.sqlite as it might be locked by Firefox
-            temp_db = self.firefox_path + '-temp'
-            print(f"Creating temp database at: {temp_db}")
-            
-            with open(self.firefox_path, 'rb') as f_in:
-                with open(temp_db, 'wb') as f_out:
-                    f_out.write(f_in.read())
-            
-            conn = sqlite3.connect(temp_db)
-            c = conn.cursor()
-            
-            # Query recent history
-            query = '''
-                SELECT url, visit_date/1000000 
-                FROM moz_places mp
-                JOIN moz_historyvisits mh ON mp.id = mh.place_id
-                WHERE visit_date/1000000 >= ?
-                ORDER BY visit_date DESC
-            '''
-            print(f"Executing query with timestamp: {start_time.timestamp()}")
-            
-            c.execute(query, (start_time.timestamp(),))
-            
-            all_visits = c.fetchall()
-            print(f"Found {len(all_visits)} total visits")
-            
-            for url, timestamp in all_visits:
-                print(f"Checking URL: {url}")
-                if any(site.lower() in url.lower() for site in self.blocked_sites):
-                    visit_time = datetime.fromtimestamp(timestamp)
-                    attempts.append((url, visit_time))
-                    print(f"Found blocked attempt: {url} at {visit_time}")
-                    
-            conn.close()
-            os.remove(temp_db)
-            
-        except Exception as e:
-            print(f"Error monitoring Firefox: {e}")
-            import traceback
-            traceback.print_exc()
+            parser.read(ini_path, encoding='utf-8')
+        except configparser.Error as e:
+            logger.warning("Could not parse %s: %s", ini_path, e)
+            return []
+
+        ini_dir = os.path.dirname(ini_path)
+        install_defaults = {
+            parser[section].get('Default') for section in parser.sections()
+            if section.startswith('Install')
+        }
+        profiles = []
+        for section in parser.sections():
+            if not section.startswith('Profile') or 'Path' not in parser[section]:
+                continue
+            profile = parser[section]
+            profile_dir = profile['Path']
+            if profile.get('IsRelative', '1') == '1':
+                profile_dir = os.path.join(ini_dir, *profile_dir.split('/'))
+            is_default = (profile['Path'] in install_defaults
+                          or profile.get('Default') == '1')
+            profiles.append((not is_default, os.path.join(profile_dir, 'places.sqlite')))
+        return [path for _, path in sorted(profiles, key=lambda p: p[0])]
             
-        print(f"Found {len(attempts)} blocked attempts")
+    def check_blocked_access(self, start_time):
+        """
+        Return blocked visits made since start_time that previous scans of
+        this profile have not already reported. The last processed
+        moz_historyvisits id/visit_date is kept in productivity.db so each
+        call only reads visits newer than that high-water mark.
+        """
+        attempts = list(self.iter_blocked_access(start_time))
+        logger.debug("Found %d blocked attempts", len(attempts))
         return attempts 
 
-    def block_sites(self):
-        """Block sites in both Firefox and hosts file"""
-        firefox_success = False
+    def iter_blocked_access(self, start_time, batch_size=SCAN_BATCH_SIZE):
+        """
+        Yield a BlockedAttempt for each new blocked visit as it is found.
+        Rows are read with fetchmany, so memory is bounded by batch_size
+        rather than by the amount of history. A profile's scan cursor only
+        moves forward once every attempt from it has been consumed.
+
+        With several profiles each one is scanned on its own thread;
+        sqlite3 releases the GIL while querying, so the scan takes about
+        as long as the slowest profile. Cursors are read and written here,
+        on the consuming thread, never by the workers.
+        """
+        logger.debug("Checking for blocked access since: %s", start_time)
+
+        places_paths = [p for p in self.profile_paths if p and os.path.exists(p)]
+        if not places_paths:
+            logger.warning("Firefox profile not found or inaccessible")
+            return
+
+        if len(places_paths) == 1:
+            places_path = places_paths[0]
+            cursor = yield from self._iter_profile(
+                places_path, start_time, batch_size, self.db.get_scan_cursor(places_path))
+            if cursor is not None:
+                self.db.set_scan_cursor(places_path, *cursor)
+            return
+
+        # Bounded, so a slow consumer holds back the workers rather than
+        # letting unread attempts pile up
+        results = queue.Queue(maxsize=batch_size)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=_PUT_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    pass
+
+        def scan(places_path, cursor):
+            profile_scan = self._iter_profile(places_path, start_time, batch_size, cursor)
+            new_cursor = None
+            try:
+                while not stop.is_set():
+                    try:
+                        attempt = next(profile_scan)
+                    except StopIteration as finished:
+                        new_cursor = finished.value
+                        break
+                    put(attempt)
+            finally:
+                profile_scan.close()
+                put(_ProfileDone(places_path, new_cursor))
+
+        futures = [self._scan_pool.submit(scan, places_path, self.db.get_scan_cursor(places_path))
+                   for places_path in places_paths]
+        try:
+            remaining = len(futures)
+            while remaining:
+                item = results.get()
+                if isinstance(item, _ProfileDone):
+                    remaining -= 1
+                    # Everything this profile's worker queued before it has
+                    # been handed out, so its cursor can move
+                    if item.cursor is not None:
+                        self.db.set_scan_cursor(item.places_path, *item.cursor)
+                else:
+                    yield item
+        finally:
+            stop.set()
+            wait(futures)
+
+    def _iter_profile(self, places_path, start_time, batch_size, cursor):
+        """
+        Yield the profile's new blocked attempts; returns the cursor to
+        store once they have all been consumed, or None on error.
+        """
         try:
-            # Try Firefox blocking first
-            firefox_success = self.firefox_blocker.block_sites()
+            # Reads places.sqlite in place, or a snapshot if Firefox locks it
+            with places_reader(places_path) as conn:
+                return (yield from self._scan_places(conn, places_path, start_time,
+                                                     batch_size, cursor))
+
         except Exception as e:
-            print(f"Firefox blocking failed: {e}")
+            logger.exception("Error monitoring Firefox profile %s: %s", places_path, e)
+            return None
+
+    def _scan_places(self, conn, places_path, start_time, batch_size, cursor):
+        started = time.perf_counter()
+        counts = {'rows': 0, 'blocked': 0}
+        c = conn.cursor()
+
+        last_visit_id, last_visit_date = cursor
+        c.execute('SELECT MAX(id), MAX(visit_date) FROM moz_historyvisits')
+        max_visit_id, max_visit_date = c.fetchone()
+        max_visit_id = max_visit_id or 0
+        max_visit_date = max_visit_date or 0
+        if max_visit_id < last_visit_id:
+            # History was cleared and ids restarted, rescan from scratch
+            logger.info("History ids went backwards, resetting scan cursor for %s", places_path)
+            last_visit_id = 0
+
+        start_visit_date = int(start_time.timestamp() * 1000000)
+        logger.debug("Querying visits %d-%d since %s", last_visit_id, max_visit_id, start_time)
+        params = (last_visit_id, max_visit_id, start_visit_date)
+
+        columns = {row[1] for row in c.execute('PRAGMA table_info(moz_places)')}
+        if 'rev_host' in columns:
+            batches = self._query_blocked_visits(c, params, batch_size, counts)
+        else:
+            batches = self._filter_all_visits(c, params, batch_size, counts)
+
+        for batch in batches:
+            counts['blocked'] += len(batch)
+            for visit_id, url, visit_date in batch:
+                visit_time = datetime.fromtimestamp(visit_date / 1000000)
+                logger.debug("Found blocked attempt: %s at %s", url, visit_time)
+                yield BlockedAttempt(url, visit_time, places_path, visit_id)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self.scan_stats['scans'] += 1
+            self.scan_stats['rows_scanned'] += counts['rows']
+            self.scan_stats['matches'] += counts['blocked']
+            self.scan_stats['elapsed_ms'] += elapsed_ms
+        logger.info("Scanned %s: visits %d-%d, %d rows scanned, %d matches, %.1f ms",
+                    places_path, last_visit_id, max_visit_id,
+                    counts['rows'], counts['blocked'], elapsed_ms)
+        return max_visit_id, max_visit_date
+
+    @staticmethod
+    def _fetch_batches(c, batch_size, counts):
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                return
+            counts['rows'] += len(rows)
+            yield rows
+
+    def _query_blocked_visits(self, c, params, batch_size, counts):
+        """
+        Let SQLite do the filtering: host rules become range seeks on the
+        indexed moz_places.rev_host, so only blocked places are joined to
+        their visits, and substring rules are checked with instr() on the
+        visits in range. Places matched against imported lists are added
+        by _match_imported_places. Only matching rows reach Python.
+        """
+        c.execute('CREATE TEMP TABLE IF NOT EXISTS blocked_hosts '
+                  '(lo TEXT PRIMARY KEY, hi TEXT NOT NULL)')
+        c.execute('CREATE TEMP TABLE IF NOT EXISTS blocked_patterns '
+                  '(pattern TEXT PRIMARY KEY)')
+        c.execute('DELETE FROM temp.blocked_hosts')
+        c.execute('DELETE FROM temp.blocked_patterns')
+        # 'moc.a.' <= rev_host < 'moc.a/' matches a.com and every subdomain
+        c.executemany('INSERT INTO temp.blocked_hosts (lo, hi) VALUES (?, ?)',
+                      ((reverse_host(h), reverse_host(h)[:-1] + '/') for h in self.matcher.hosts))
+        c.executemany('INSERT INTO temp.blocked_patterns (pattern) VALUES (?)',
+                      ((p,) for p in self.matcher.patterns))
+        self._match_imported_places(c, params)
+
+        query = '''
+            SELECT mh.id, mp.url, mh.visit_date
+            FROM temp.blocked_hosts bh
+            JOIN moz_places mp ON mp.rev_host >= bh.lo AND mp.rev_host < bh.hi
+            JOIN moz_historyvisits mh ON mh.place_id = mp.id
+            WHERE mh.id > ?1 AND mh.id <= ?2 AND mh.visit_date >= ?3
+            UNION
+            SELECT mh.id, mp.url, mh.visit_date
+            FROM temp.blocked_places bp
+            JOIN moz_places mp ON mp.id = bp.place_id
+            JOIN moz_historyvisits mh ON mh.place_id = mp.id
+            WHERE mh.id > ?1 AND mh.id <= ?2 AND mh.visit_date >= ?3
+            UNION
+            SELECT mh.id, mp.url, mh.visit_date
+            FROM moz_historyvisits mh
+            JOIN moz_places mp ON mp.id = mh.place_id
+            WHERE mh.id > ?1 AND mh.id <= ?2 AND mh.visit_date >= ?3
+                AND EXISTS (SELECT 1 FROM temp.blocked_patterns bp
+                            WHERE instr(lower(mp.url), bp.pattern) > 0)
+            ORDER BY 3 DESC
+        '''
+        c.execute(query, params)
+        return self._fetch_batches(c, batch_size, counts)
+
+    def _match_imported_places(self, c, params):
+        """
+        Fill temp.blocked_places with the places, among those visited in
+        range, whose host is in an imported blocklist. Those lists are too
+        big to copy into a temp table, so the distinct hosts of the new
+        visits are looked up in the store instead.
+        """
+        c.execute('CREATE TEMP TABLE IF NOT EXISTS blocked_places '
+                  '(place_id INTEGER PRIMARY KEY)')
+        c.execute('DELETE FROM temp.blocked_places')
+        if not self.matcher.has_imported_hosts():
+            return
+        places = c.execute('''
+            SELECT DISTINCT mp.id, mp.rev_host
+            FROM moz_historyvisits mh
+            JOIN moz_places mp ON mp.id = mh.place_id
+            WHERE mh.id > ?1 AND mh.id <= ?2 AND mh.visit_date >= ?3
+                AND mp.rev_host IS NOT NULL
+        ''', params).fetchall()
+        blocked = self.matcher.store.blocked_rev_hosts(rev_host for _, rev_host in places)
+        c.executemany('INSERT INTO temp.blocked_places (place_id) VALUES (?)',
+                      ((place_id,) for place_id, rev_host in places if rev_host in blocked))
+
+    def _filter_all_visits(self, c, params, batch_size, counts):
+        """Fallback for history databases without a rev_host column"""
+        query = '''
+            SELECT mh.id, url, visit_date
+            FROM moz_places mp
+            JOIN moz_historyvisits mh ON mp.id = mh.place_id
+            WHERE mh.id > ? AND mh.id <= ?
+                AND visit_date >= ?
+            ORDER BY visit_date DESC
+        '''
+        c.execute(query, params)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for batch in self._fetch_batches(c, batch_size, counts):
+            matches = []
+            for row in batch:
+                if debug:
+                    logger.debug("Checking URL: %s", row[1])
+                if self.matcher.matches(row[1]):
+                    matches.append(row)
+            yield matches
+
+    def release_thread_connections(self):
+        """
+        Close the connections scans opened on the calling thread; for
+        short-lived threads such as a session's watcher
+        """
+        self.db.release_reader()
+        if self.matcher.store is not None:
+            self.matcher.store.release_reader()
+
+    def block_sites(self, backend='auto'):
+        """
+        Block sites with one of BLOCKING_BACKENDS:
+        'auto' tries Firefox and falls back to the hosts file,
+        'firefox' and 'hosts' use only that method, and 'dns' starts the
+        local DNS sinkhole (the system resolver must point at it).
+        """
+        if backend not in BLOCKING_BACKENDS:
+            raise ValueError(f"Unknown blocking backend {backend!r}, "
+                             f"expected one of {', '.join(BLOCKING_BACKENDS)}")
+        if backend == 'dns':
+            return self._start_dns_sinkhole()
+
+        firefox_success = False
+        if backend in ('auto', 'firefox'):
+            try:
+                firefox_success = self.firefox_blocker.block_sites()
+            except Exception as e:
+                logger.warning("Firefox blocking failed: %s", e)
+            if backend == 'firefox':
+                return bool(firefox_success)
 
         if not firefox_success:
-            print("Falling back to hosts-based blocking...")
+            if backend == 'auto':
+                logger.info("Falling back to hosts-based blocking")
             try:
                 self.hosts_blocker.block_websites()
                 return True
             except Exception as e:
-                print(f"Hosts blocking failed: {e}")
+                logger.error("Hosts blocking failed: %s", e)
                 return False
         return True
 
+    def _start_dns_sinkhole(self):
+        from .dns_sinkhole import DnsSinkhole, DEFAULT_LISTEN
+        if self.dns_sinkhole is not None and self.dns_sinkhole.running:
+            return True
+        if self.dns_upstream is None:
+            logger.error("No upstream resolver set for the DNS sinkhole; "
+                         "pass one with 'cli.py block --backend dns --upstream ADDRESS'")
+            return False
+        listen = self.dns_listen or DEFAULT_LISTEN
+        sinkhole = DnsSinkhole.from_matcher(self.matcher, listen=listen,
+                                            upstream=self.dns_upstream)
+        try:
+            sinkhole.start_thread()
+        except OSError as e:
+            logger.error("Could not start the DNS sinkhole on %s:%d: %s", *listen, e)
+            return False
+        self.dns_sinkhole = sinkhole
+        return True
+
     def unblock_sites(self):
-        """Unblock sites from both Firefox and hosts file"""
+        """Unblock sites from Firefox and the hosts file and stop the DNS sinkhole"""
+        if self.dns_sinkhole is not None:
+            self.dns_sinkhole.stop()
+            self.dns_sinkhole = None
+
         # Always try to unblock both methods
         firefox_success = self.firefox_blocker.unblock_sites()
         hosts_success = False
@@ -112,7 +451,7 @@ class FirefoxMonitor:
             self.hosts_blocker.unblock_websites()
             hosts_success = True
         except Exception as e:
-            print(f"Hosts unblocking failed: {e}")
+            logger.error("Hosts unblocking failed: %s", e)
 
         return firefox_success or hosts_success
 
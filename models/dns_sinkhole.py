@@ -0,0 +1,265 @@
+"""
+Local DNS sinkhole: a blocking backend that needs no hosts-file writes.
+
+Point the system resolver at DEFAULT_LISTEN and every query is checked
+against an in-memory set of blocked domains. Blocked names get 0.0.0.0
+(or :: for AAAA), everything else is forwarded unchanged to the upstream
+resolver. A lookup walks the queried name's parent domains, one hash
+probe per label, however many domains are blocked.
+
+There is no default upstream: every query that isn't blocked leaves the
+machine, so which resolver gets them is left to the user
+('cli.py block --backend dns --upstream ADDRESS').
+"""
+import asyncio
+import struct
+import threading
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LISTEN = ('127.0.0.1', 53)
+DNS_PORT = 53
+UPSTREAM_TIMEOUT = 2.0
+BLOCKED_TTL = 300
+
+TYPE_A = 1
+TYPE_AAAA = 28
+CLASS_IN = 1
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+
+_HEADER = struct.Struct('!HHHHHH')
+# Sinkhole addresses per query type; other types get an empty answer
+_SINKHOLE_RDATA = {TYPE_A: bytes(4), TYPE_AAAA: bytes(16)}
+
+
+def parse_address(text, default_port=DNS_PORT):
+    """
+    ('host', port) from 'host', 'host:port', an IPv6 address or
+    '[v6 address]:port'. Raises ValueError for a bad port.
+    """
+    text = text.strip()
+    if text.startswith('['):
+        host, _, rest = text[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif text.count(':') == 1:
+        host, port = text.split(':')
+    else:
+        host, port = text, ''
+    if not host:
+        raise ValueError(f"No host in address {text!r}")
+    port = int(port) if port else default_port
+    if not 0 <= port <= 65535:
+        raise ValueError(f"Port out of range in address {text!r}")
+    return host, port
+
+
+def build_query(name, qtype=TYPE_A, query_id=0):
+    """A recursive query for name, as a resolver would send it"""
+    question = b''.join(bytes([len(label)]) + label.encode('ascii')
+                        for label in name.rstrip('.').split('.')) + b'\0'
+    return (_HEADER.pack(query_id, 0x0100, 1, 0, 0, 0)
+            + question + struct.pack('!HH', qtype, CLASS_IN))
+
+
+def parse_question(message):
+    """
+    (query id, flags, name, qtype, end offset of the question) of a
+    query. Raises ValueError if the message is not a single-question query.
+    """
+    if len(message) < _HEADER.size:
+        raise ValueError("Message shorter than a DNS header")
+    query_id, flags, qdcount = _HEADER.unpack_from(message)[:3]
+    if flags & 0x8000 or qdcount != 1:
+        raise ValueError("Not a single-question query")
+    labels = []
+    offset = _HEADER.size
+    while True:
+        if offset >= len(message):
+            raise ValueError("Truncated question")
+        length = message[offset]
+        offset += 1
+        if length == 0:
+            break
+        if length > 63:
+            raise ValueError("Compressed or invalid label in question")
+        labels.append(message[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    if offset + 4 > len(message):
+        raise ValueError("Truncated question")
+    qtype, = struct.unpack_from('!H', message, offset)
+    return query_id, flags, '.'.join(labels).lower(), qtype, offset + 4
+
+
+def build_response(query, question_end, rcode=0, rdata=None, qtype=None):
+    """Answer query with rcode and, if rdata is given, one record of qtype"""
+    query_id, flags = struct.unpack_from('!HH', query)
+    # QR and RA set, RD copied from the query
+    flags = 0x8080 | (flags & 0x0100) | rcode
+    answer = b''
+    if rdata is not None:
+        # 0xc00c points back at the name in the question
+        answer = struct.pack('!HHHIH', 0xc00c, qtype, CLASS_IN, BLOCKED_TTL, len(rdata)) + rdata
+    header = _HEADER.pack(query_id, flags, 1, 1 if answer else 0, 0, 0)
+    return header + query[_HEADER.size:question_end] + answer
+
+
+class _UpstreamProtocol(asyncio.DatagramProtocol):
+    def __init__(self, reply, query_id):
+        self.reply = reply
+        self.query_id = query_id
+
+    def datagram_received(self, data, addr):
+        # Ignore anything that isn't the answer to our query
+        if data[:2] == self.query_id and not self.reply.done():
+            self.reply.set_result(data)
+
+    def error_received(self, exc):
+        if not self.reply.done():
+            self.reply.set_exception(exc)
+
+
+class _SinkholeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sinkhole):
+        self.sinkhole = sinkhole
+        self.transport = None
+        # The loop only keeps weak references to tasks
+        self._pending = set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        task = asyncio.ensure_future(self._answer(data, addr))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _answer(self, data, addr):
+        response = await self.sinkhole.resolve(data)
+        if response is not None and self.transport is not None:
+            self.transport.sendto(response, addr)
+
+
+class DnsSinkhole:
+    """
+    UDP DNS responder that sinks the names in blocked (and their
+    subdomains) and forwards every other query to upstream. Use start()
+    and close() inside an event loop, or start_thread()/stop() to run it
+    alongside synchronous code.
+    """
+
+    def __init__(self, blocked, upstream, listen=DEFAULT_LISTEN, timeout=UPSTREAM_TIMEOUT):
+        self.blocked = blocked if isinstance(blocked, (set, frozenset)) else set(blocked)
+        self.upstream = upstream
+        self.listen = listen
+        self.timeout = timeout
+        self.stats = Counter()
+        self.transport = None
+        self._loop = None
+        self._thread = None
+
+    @classmethod
+    def from_matcher(cls, matcher, **kwargs):
+        """Sinkhole for a BlocklistMatcher's host rules and imported lists"""
+        blocked = set(matcher.hosts)
+        blocked.update(matcher.imported_host_entries())
+        return cls(blocked, **kwargs)
+
+    def is_blocked(self, name):
+        name = name.lower().rstrip('.')
+        while name:
+            if name in self.blocked:
+                return True
+            name = name.partition('.')[2]
+        return False
+
+    async def resolve(self, query):
+        """The response to send for query, or None to drop it"""
+        self.stats['queries'] += 1
+        try:
+            _, _, name, qtype, question_end = parse_question(query)
+        except ValueError:
+            if len(query) < _HEADER.size:
+                return None
+            self.stats['malformed'] += 1
+            return _HEADER.pack(struct.unpack_from('!H', query)[0], 0x8080 | RCODE_FORMERR,
+                                0, 0, 0, 0)
+
+        if self.is_blocked(name):
+            self.stats['blocked'] += 1
+            logger.debug("Sinkholed %s (type %d)", name, qtype)
+            return build_response(query, question_end, rdata=_SINKHOLE_RDATA.get(qtype), qtype=qtype)
+
+        try:
+            response = await self._forward(query)
+            self.stats['forwarded'] += 1
+            return response
+        except (OSError, asyncio.TimeoutError) as e:
+            self.stats['upstream_errors'] += 1
+            logger.warning("Upstream %s:%d failed for %s: %r", *self.upstream, name, e)
+            return build_response(query, question_end, rcode=RCODE_SERVFAIL)
+
+    async def _forward(self, query):
+        # A fresh socket per query gives each one its own random source port
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UpstreamProtocol(reply, query[:2]), remote_addr=self.upstream)
+        try:
+            transport.sendto(query)
+            return await asyncio.wait_for(reply, self.timeout)
+        finally:
+            transport.close()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: _SinkholeProtocol(self), local_addr=self.listen)
+        self.listen = self.transport.get_extra_info('sockname')[:2]
+        logger.info("DNS sinkhole for %d domains on %s:%d, forwarding to %s:%d",
+                    len(self.blocked), *self.listen, *self.upstream)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def start_thread(self):
+        """Serve from a daemon thread; returns once the socket is bound"""
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start())
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                self._loop.close()
+                return
+            started.set()
+            try:
+                self._loop.run_forever()
+            finally:
+                self.close()
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='dns-sinkhole', daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
@@ -1,44 +1,96 @@
 import os
+import hashlib
+import shutil
+import tempfile
+import logging
+from .blocklist_matcher import BlocklistMatcher
+
+logger = logging.getLogger(__name__)
+
+# First line of the generated user.js; carries the hash of the policy
+# so an unchanged blocklist doesn't rewrite the file
+POLICY_HEADER = "// productivity-tracker blocking policy sha256="
+# prefs.js lines mentioning these are left over from the blocking policy
+_POLICY_PREF_MARKERS = ("blocksites", "capability.policy")
+
+
+def _rewrite_file(path, write):
+    """
+    Call write(out) with a temp file in path's directory and rename the
+    temp file over path if it returns True. On errors, or if write
+    returns False, path is left as it was.
+    """
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape', newline='') as out:
+            replace = write(out)
+        if replace:
+            if os.path.exists(path):
+                shutil.copymode(path, temp_path)
+            os.replace(temp_path, path)
+        return replace
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
 
 class FirefoxBlocker:
-    def __init__(self, firefox_path, blocked_sites):
+    def __init__(self, firefox_path, blocked_sites, matcher=None):
         self.firefox_path = firefox_path
         self.blocked_sites = blocked_sites
+        self.matcher = matcher if matcher is not None else BlocklistMatcher(blocked_sites)
+
+    def blocked_origins(self):
+        """Sorted origins for the policy: http(s) for each host and its www."""
+        return [f"{scheme}://{name}"
+                for host in sorted(self.matcher.hosts)
+                for name in (host, f"www.{host}")
+                for scheme in ("http", "https")]
+
+    def build_policy(self):
+        """The user.js content: one sites pref listing every blocked origin"""
+        body = "\n".join([
+            'user_pref("capability.policy.policynames", "blocksites");',
+            f'user_pref("capability.policy.blocksites.sites", "{" ".join(self.blocked_origins())}");',
+            'user_pref("capability.policy.blocksites.checkloaduri.enabled", "allAccess");',
+        ]) + "\n"
+        digest = hashlib.sha256(body.encode('utf-8')).hexdigest()
+        return f"{POLICY_HEADER}{digest}\n{body}"
 
     def block_sites(self):
         """Firefox-specific blocking implementation"""
         if not self.firefox_path:
-            print("Firefox profile not found")
+            logger.warning("Firefox profile not found")
             return False
 
         try:
             profile_dir = os.path.dirname(self.firefox_path)
             user_prefs_path = os.path.join(profile_dir, "user.js")
+            policy = self.build_policy()
 
-            # Create blocking rules
-            blocking_rules = []
-            for site in self.blocked_sites:
-                site = site.replace("www.", "").replace("https://", "").replace("http://", "").strip("/")
-                if site:
-                    blocking_rules.append(f'user_pref("capability.policy.policynames", "blocksites");')
-                    blocking_rules.append(f'user_pref("capability.policy.blocksites.sites", "http://{site} https://{site} http://www.{site} https://www.{site}");')
-                    blocking_rules.append(f'user_pref("capability.policy.blocksites.checkloaduri.enabled", "allAccess");')
+            # Only the header line is needed to tell whether anything changed
+            try:
+                with open(user_prefs_path, 'r', encoding='utf-8') as f:
+                    current_header = f.readline()
+            except FileNotFoundError:
+                current_header = None
+            if current_header == policy[:policy.index("\n") + 1]:
+                logger.info("Firefox profile %s already has the current policy", profile_dir)
+                return True
 
-            # Write to user.js
-            with open(user_prefs_path, 'w') as f:
-                f.write('\n'.join(blocking_rules))
-
-            print("Sites blocked successfully!")
+            _rewrite_file(user_prefs_path, lambda out: out.write(policy) or True)
+            logger.info("Sites blocked in Firefox profile %s", profile_dir)
             return True
 
         except Exception as e:
-            print(f"Error blocking sites: {e}")
+            logger.error("Error blocking sites: %s", e)
             return False
 
     def unblock_sites(self):
         """Firefox-specific unblocking implementation"""
         if not self.firefox_path:
-            print("Firefox profile not found")
+            logger.warning("Firefox profile not found")
             return False
 
         try:
@@ -48,26 +100,39 @@ class FirefoxBlocker:
             # Remove the user.js file if it exists
             if os.path.exists(user_prefs_path):
                 os.remove(user_prefs_path)
-                print(f"Removed blocking rules from {user_prefs_path}")
+                logger.info("Removed blocking rules from %s", user_prefs_path)
 
             # Also check for prefs.js and remove blocking related entries
             prefs_js_path = os.path.join(profile_dir, "prefs.js")
-            if os.path.exists(prefs_js_path):
-                with open(prefs_js_path, 'r') as f:
-                    lines = f.readlines()
-                
-                with open(prefs_js_path, 'w') as f:
-                    for line in lines:
-                        if not any(x in line.lower() for x in ["blocksites", "capability.policy"]):
-                            f.write(line)
-
-            print("Sites unblocked successfully!")
+            if os.path.exists(prefs_js_path) and _rewrite_file(
+                    prefs_js_path, lambda out: self._filter_prefs(prefs_js_path, out)):
+                logger.info("Removed blocking prefs from %s", prefs_js_path)
+
+            logger.info("Sites unblocked in Firefox profile %s", profile_dir)
             return True
 
         except Exception as e:
-            print(f"Error unblocking sites: {e}")
+            logger.error("Error unblocking sites: %s", e)
             return False
 
+    @staticmethod
+    def _filter_prefs(prefs_js_path, out):
+        """
+        Copy prefs.js to out a line at a time, minus the policy prefs, so
+        memory stays bounded however large the profile's prefs are.
+        Returns whether any line was dropped.
+        """
+        removed = False
+        with open(prefs_js_path, 'r', encoding='utf-8', errors='surrogateescape',
+                  newline='') as src:
+            for line in src:
+                lowered = line.lower()
+                if any(marker in lowered for marker in _POLICY_PREF_MARKERS):
+                    removed = True
+                else:
+                    out.write(line)
+        return removed
+
     def check_blocking_status(self, urls=None):
         """
         Check if specified URLs or all blocked sites are currently blocked.
@@ -77,11 +142,11 @@ class FirefoxBlocker:
         if urls is None:
             urls = self.blocked_sites
 
-        profile_dir = os.path.dirname(self.firefox_path)
-        user_prefs_path = os.path.join(profile_dir, "user.js")
-        
         # Check if blocking is actually enabled
-        blocking_enabled = os.path.exists(user_prefs_path)
+        blocking_enabled = False
+        if self.firefox_path:
+            profile_dir = os.path.dirname(self.firefox_path)
+            blocking_enabled = os.path.exists(os.path.join(profile_dir, "user.js"))
         
         status_report = ["Blocking Status Report:", "-" * 50]
         status_report.append(f"Global Blocking Status: {'🚫 Enabled' if blocking_enabled else '✅ Disabled'}\n")
@@ -91,7 +156,7 @@ class FirefoxBlocker:
             normalized_url = url.lower().replace('https://', '').replace('http://', '').replace('www.', '').strip('/')
             if normalized_url not in checked:
                 checked.add(normalized_url)
-                is_blocked = blocking_enabled and url in self.blocked_sites
+                is_blocked = blocking_enabled and self.matcher.matches(url)
                 status_report.append(f"{url:<30} {'🚫 Blocked' if is_blocked else '✅ Not Blocked'}")
         
         status_report.append("-" * 50)
@@ -1,8 +1,18 @@
-import time
-from datetime import datetime
+import os
 import platform
 import sys
-import argparse
+import logging
+
+if __name__ == "__main__" and not __package__:
+    # Run as 'python models/hosts_blocker.py': make the repository root
+    # importable so the package imports below and the CLI resolve
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = 'models'
+
+from .blocklist_matcher import get_default_matcher
+from .hosts_file import get_hosts_file, section_digest
+
+logger = logging.getLogger(__name__)
 
 # Determine the hosts file location based on the operating system
 def get_hosts_path():
@@ -12,100 +22,99 @@ def get_hosts_path():
         return "/etc/hosts"
 
 class WebsiteBlocker:
-    def __init__(self):
+    def __init__(self, matcher=None):
         self.hosts_path = get_hosts_path()
         self.redirect = "127.0.0.1"
-        self.blocked_sites = [
-            "facebook.com",
-            "www.youtube.com",
-            "https://www.youtube.com/",
-            "https://www.youtube.com",
-            "youtube.com",
-            "www.instagram.com",
-            "instagram.com",
-            "www.twitter.com",
-            "twitter.com",
-            "reddit.com",
-            "www.tiktok.com",
-            "tiktok.com",
-            "www.twitch.tv",
-            "twitch.tv",
-            "old.reddit.com",
-            # Reddit variants
-            "www.reddit.com",
-            "old.reddit.com",
-            "new.reddit.com",
-            "np.reddit.com",
-            # Add https and http explicitly
-            "https://reddit.com",
-            "https://www.reddit.com",
-            "http://reddit.com",
-            "http://www.reddit.com",
-            '/r/',
-            # Add your other sites with similar variants
-            "facebook.com",
-            "www.facebook.com",
-            "youtube.com",
-            "www.youtube.com",
-            "4chan.org",
-            "www.4chan.org",
-            "4chan.net",
-            "www.4chan.net",
-            "4channel.org",
-            "www.4channel.org",
-            "sflix.to",
-            "www.sflix.to",
-            "sflix.to",
-            "www.sflix.to",
-            "netflix.com",
-            "www.netflix.com",
-            "netflix.net",
-            "www.netflix.net",
-            "netflix.net",
-            "www.netflix.net",
-        ]
+        self.matcher = matcher if matcher is not None else get_default_matcher()
+        self.blocked_sites = self.matcher.host_entries()
+        # (HostsIndex, blocked?) of the last status check
+        self._status = (None, False)
+
+    @property
+    def hosts(self):
+        return get_hosts_file(self.hosts_path)
+
+    def _is_legacy_entry(self, line):
+        """A line appended by versions that wrote no markers"""
+        fields = line.split('#', 1)[0].split()
+        return (len(fields) > 1 and fields[0] == self.redirect
+                and all(self.matcher.host_blocked(name) for name in fields[1:]))
+
+    def _split_section(self, index):
+        """
+        Return (lines before the managed section, lines after it).
+        Unmarked entries left by older versions are dropped from them, so
+        they are cleaned up on the next write.
+        """
+        lines = index.lines
+        offset = index.section.offset if index.section else len(lines)
+        before = [line for line in lines[:offset] if not self._is_legacy_entry(line)]
+        after = [line for line in lines[offset:] if not self._is_legacy_entry(line)]
+        return before, after
+
+    def _section_lines(self):
+        """
+        The managed section: the configured sites, then imported lists in
+        store order. Streamed, as imported lists can run to millions of
+        names.
+        """
+        wanted = set(self.blocked_sites)
+        for site in self.blocked_sites:
+            yield f"{self.redirect} {site}"
+        for name in self.matcher.imported_host_entries():
+            if name not in wanted:
+                yield f"{self.redirect} {name}"
 
     def block_websites(self):
+        """Make the managed section hold exactly the blocked hostnames"""
         try:
-            with open(self.hosts_path, 'r+') as hosts_file:
-                content = hosts_file.read()
-                for site in self.blocked_sites:
-                    if site not in content:
-                        hosts_file.write(f"{self.redirect} {site}\n")
-            print("Websites blocked successfully")
+            index = self.hosts.index()
+            before, after = self._split_section(index)
+            # One streaming pass to tell whether anything changed, a second
+            # one only if the file has to be written
+            size, digest = section_digest(self._section_lines())
+            if (before + after == index.lines
+                    and index.section == (len(before), size, digest)):
+                logger.info("Websites already blocked in %s", self.hosts_path)
+                return
+            self.hosts.write(before, self._section_lines(), after)
+            logger.info("Websites blocked in %s (%d entries, %d before)", self.hosts_path,
+                        size, index.section.size if index.section else 0)
         except PermissionError:
-            print("Error: Please run the script with administrator/root privileges")
+            logger.error("Please run the script with administrator/root privileges")
             sys.exit(1)
 
     def unblock_websites(self):
+        """Drop the managed section, leaving every other line untouched"""
         try:
-            with open(self.hosts_path, 'r+') as hosts_file:
-                lines = hosts_file.readlines()
-                hosts_file.seek(0)
-                for line in lines:
-                    if not any(site in line for site in self.blocked_sites):
-                        hosts_file.write(line)
-                hosts_file.truncate()
-            print("Websites unblocked successfully")
+            index = self.hosts.index()
+            before, after = self._split_section(index)
+            if index.section is None and before + after == index.lines:
+                logger.info("No blocked websites in %s", self.hosts_path)
+                return
+            self.hosts.write(before, None, after)
+            logger.info("Websites unblocked in %s", self.hosts_path)
         except PermissionError:
-            print("Error: Please run the script with administrator/root privileges")
+            logger.error("Please run the script with administrator/root privileges")
             sys.exit(1)
 
+    def is_blocked(self):
+        """
+        True if the hosts file has a non-empty managed section or an entry
+        for a blocked site. The answer is kept with the parsed index, so
+        until the file changes this costs one stat() call.
+        """
+        index = self.hosts.index()
+        cached_index, blocked = self._status
+        if index is not cached_index:
+            blocked = ((index.section is not None and index.section.size > 0)
+                       or any(site in index.entries for site in self.blocked_sites))
+            self._status = (index, blocked)
+        return blocked
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Website Blocker')
-    parser.add_argument('action', choices=['block', 'unblock', 'status'],
-                       help='Action to perform: block, unblock, or check status')
-    
-    args = parser.parse_args()
-    blocker = WebsiteBlocker()
-    
-    if args.action == 'block':
-        blocker.block_websites()
-    elif args.action == 'unblock':
-        blocker.unblock_websites()
-    elif args.action == 'status':
-        # Add a new method to check if sites are currently blocked
-        with open(blocker.hosts_path, 'r') as hosts_file:
-            content = hosts_file.read()
-            is_blocked = any(site in content for site in blocker.blocked_sites)
-            print(f"Websites are currently {'blocked' if is_blocked else 'unblocked'}")
+    # Old entry point, kept for existing scripts: the same actions through
+    # the unified CLI, restricted to the hosts file. Works as a script or
+    # as 'python -m models.hosts_blocker'
+    from cli import main
+    sys.exit(main([*sys.argv[1:2], '--hosts']))
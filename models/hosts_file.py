@@ -0,0 +1,193 @@
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# The blocker only ever edits the lines between these markers
+BEGIN_MARKER = "# BEGIN productivity-tracker blocklist"
+END_MARKER = "# END productivity-tracker blocklist"
+# os.replace can't swap a file that is a mount point (Docker bind-mounts
+# /etc/hosts) or that lives on another device; those fall back to an
+# in-place copy of the already written temp file
+_REPLACE_FALLBACK_ERRNOS = {errno.EBUSY, errno.EXDEV}
+
+# The managed section of one parse: its position among the other lines,
+# how many lines it holds and a sha256 of them. Imported blocklists can
+# put hundreds of thousands of entries in it, so the lines themselves
+# are never kept in memory.
+ManagedSection = namedtuple('ManagedSection', 'offset size digest')
+
+# One parse of the file: the lines outside the managed section,
+# hostname -> (address, index in lines) for them with the first entry for
+# a name winning as it does for resolvers, and the ManagedSection or None
+HostsIndex = namedtuple('HostsIndex', 'lines entries section')
+
+
+class _UnterminatedSection(Exception):
+    pass
+
+
+def _hash_line(digest, line):
+    digest.update(line.encode('utf-8', 'replace'))
+    digest.update(b'\n')
+
+
+def section_digest(lines):
+    """(size, digest) a ManagedSection holding lines would have"""
+    digest = hashlib.sha256()
+    size = 0
+    for line in lines:
+        _hash_line(digest, line)
+        size += 1
+    return size, digest.hexdigest()
+
+
+def _index_entries(lines):
+    entries = {}
+    for i, line in enumerate(lines):
+        fields = line.split('#', 1)[0].split()
+        for name in fields[1:]:
+            entries.setdefault(name.lower(), (fields[0], i))
+    return entries
+
+
+def parse_hosts(lines, sections=True):
+    """
+    HostsIndex of an iterable of lines, read in one pass. With sections
+    off, marker lines are treated as ordinary comments.
+    """
+    outside = []
+    section = None
+    lines = iter(lines)
+    for line in lines:
+        if sections and line == BEGIN_MARKER:
+            offset = len(outside)
+            digest = hashlib.sha256()
+            size = 0
+            for line in lines:
+                if line == END_MARKER:
+                    break
+                _hash_line(digest, line)
+                size += 1
+            else:
+                raise _UnterminatedSection()
+            section = ManagedSection(offset, size, digest.hexdigest())
+            # Only the first section is managed; later markers are comments
+            sections = False
+        else:
+            outside.append(line)
+    return HostsIndex(outside, _index_entries(outside), section)
+
+
+class HostsFile:
+    """
+    A hosts file parsed into a HostsIndex. The index is kept until the
+    file's (st_mtime_ns, st_size) changes, so repeated status checks cost
+    one stat() rather than a read and parse of the whole file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._signature = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def index(self):
+        """The current HostsIndex, re-parsed only if the file has changed"""
+        with self._lock:
+            signature = self._stat_signature()
+            if signature != self._signature:
+                self._index = self._parse()
+                self._signature = signature
+            return self._index
+
+    def _parse(self):
+        with open(self.path, 'r') as hosts_file:
+            try:
+                return parse_hosts(line.rstrip('\r\n') for line in hosts_file)
+            except _UnterminatedSection:
+                # A BEGIN with no END isn't ours to rewrite; keep every line
+                logger.warning("Unterminated blocklist section in %s, leaving it as is", self.path)
+                hosts_file.seek(0)
+                return parse_hosts((line.rstrip('\r\n') for line in hosts_file), sections=False)
+
+    def write(self, before, section, after):
+        """
+        Replace the file with the lines before, a managed section holding
+        the lines of section (any iterable, streamed; None for no section)
+        and the lines after. Everything goes to a temp file in the same
+        directory which is then renamed over the original, so readers see
+        either the old file or the new one, never a mix.
+        """
+        def write_lines(out):
+            for line in before:
+                out.write(f"{line}\n")
+            managed = None
+            if section is not None:
+                out.write(f"{BEGIN_MARKER}\n")
+                digest = hashlib.sha256()
+                size = 0
+                for line in section:
+                    out.write(f"{line}\n")
+                    _hash_line(digest, line)
+                    size += 1
+                out.write(f"{END_MARKER}\n")
+                managed = ManagedSection(len(before), size, digest.hexdigest())
+            for line in after:
+                out.write(f"{line}\n")
+            return managed
+
+        with self._lock:
+            managed = self._replace(write_lines)
+            outside = list(before) + list(after)
+            self._index = HostsIndex(outside, _index_entries(outside), managed)
+            self._signature = self._stat_signature()
+
+    def _replace(self, write_content):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.hosts.')
+        try:
+            with os.fdopen(fd, 'w') as temp_file:
+                result = write_content(temp_file)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            shutil.copymode(self.path, temp_path)
+            try:
+                os.replace(temp_path, self.path)
+                return result
+            except OSError as e:
+                if e.errno not in _REPLACE_FALLBACK_ERRNOS:
+                    raise
+                logger.warning("Cannot rename over %s (%s), rewriting it in place",
+                               self.path, e.strerror)
+            with open(temp_path, 'rb') as temp_file, open(self.path, 'r+b') as hosts_file:
+                shutil.copyfileobj(temp_file, hosts_file)
+                hosts_file.truncate()
+                hosts_file.flush()
+                os.fsync(hosts_file.fileno())
+            return result
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+_hosts_files = {}
+_hosts_files_lock = threading.Lock()
+
+
+def get_hosts_file(path):
+    """The shared HostsFile for path, so every blocker reuses one index"""
+    with _hosts_files_lock:
+        if path not in _hosts_files:
+            _hosts_files[path] = HostsFile(path)
+        return _hosts_files[path]
@@ -0,0 +1,125 @@
+import os
+import logging
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# Pages copied per backup step; keeps memory use flat for any history size
+BACKUP_PAGES_PER_STEP = 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+# Seconds to wait on Firefox's lock before falling back to a snapshot.
+# Firefox holds it for as long as it runs, so waiting rarely helps
+IN_PLACE_BUSY_TIMEOUT = 0
+
+logger = logging.getLogger(__name__)
+
+
+def _read_only_uri(path):
+    return f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+
+
+def _copy_with_wal(places_path, snapshot_path):
+    """Fallback when Firefox holds an exclusive lock: copy the files as-is"""
+    logger.debug("%s is locked, copying it with its WAL instead", places_path)
+    for suffix in ('', '-wal'):
+        source = places_path + suffix
+        if os.path.exists(source):
+            with open(source, 'rb') as f_in, open(snapshot_path + suffix, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out, COPY_BUFFER_SIZE)
+
+
+def _backup(places_path, snapshot_path, pages_per_step):
+    try:
+        source = sqlite3.connect(_read_only_uri(places_path), uri=True, timeout=1)
+    except sqlite3.OperationalError:
+        _copy_with_wal(places_path, snapshot_path)
+        return
+
+    try:
+        # backup() retries a locked source forever, so take the read lock
+        # here first, where a lock fails after timeout instead; the backup
+        # then runs inside this read transaction
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        dest = sqlite3.connect(snapshot_path)
+        try:
+            # The backup reads through SQLite, so visits still sitting in
+            # places.sqlite-wal are included in the snapshot
+            source.backup(dest, pages=pages_per_step)
+        finally:
+            dest.close()
+    except sqlite3.OperationalError as e:
+        if 'locked' not in str(e) and 'busy' not in str(e):
+            raise
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        _copy_with_wal(places_path, snapshot_path)
+    finally:
+        source.close()
+
+
+@contextmanager
+def places_snapshot(places_path, pages_per_step=BACKUP_PAGES_PER_STEP, locked=False):
+    """
+    Yield a connection to a private snapshot of places.sqlite. With
+    locked, the caller already knows Firefox holds its lock, so the files
+    are copied straight away instead of first trying a backup.
+
+    The snapshot lives in its own temp directory, which is removed on exit,
+    so nothing is ever written next to the Firefox profile.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='places-snapshot-')
+    try:
+        snapshot_path = os.path.join(temp_dir, 'places.sqlite')
+        if locked:
+            _copy_with_wal(places_path, snapshot_path)
+        else:
+            _backup(places_path, snapshot_path, pages_per_step)
+        conn = sqlite3.connect(snapshot_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _open_in_place(places_path):
+    """
+    Read-only connection to places.sqlite itself, or None if Firefox holds
+    a lock on it (or it can't be opened read-only at all).
+    """
+    try:
+        conn = sqlite3.connect(_read_only_uri(places_path), uri=True,
+                               timeout=IN_PLACE_BUSY_TIMEOUT)
+    except sqlite3.OperationalError:
+        return None
+    try:
+        # Opening is lazy; the first read is what runs into the lock
+        conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+    except sqlite3.OperationalError as e:
+        logger.debug("Cannot read %s in place (%s), using a snapshot", places_path, e)
+        conn.close()
+        return None
+    return conn
+
+
+@contextmanager
+def places_reader(places_path, pages_per_step=BACKUP_PAGES_PER_STEP):
+    """
+    Yield a read-only connection to places.sqlite when Firefox isn't
+    locking it, and to a places_snapshot only when it is. Incremental
+    scans read a handful of new visits, so reading in place spares them
+    a copy of the whole database (and its WAL) on every change.
+    """
+    conn = _open_in_place(places_path)
+    if conn is None:
+        with places_snapshot(places_path, pages_per_step, locked=True) as snapshot:
+            yield snapshot
+        return
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,29 @@
+import threading
+
+# One FirefoxMonitor (and with it one WebsiteBlocker and FirefoxBlocker)
+# per process, built the first time something needs it
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor(db=None):
+    """
+    Return the shared FirefoxMonitor, creating it on first use. db is the
+    ActivityDatabase the monitor keeps its scan cursors in; it only
+    matters for the call that builds the monitor.
+    """
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            # Imported here so callers that never touch the browser
+            # don't pay for the monitor's imports at startup
+            from .browser_monitor import FirefoxMonitor
+            _monitor = FirefoxMonitor(db)
+        return _monitor
+
+
+def reset_monitor():
+    """Forget the shared monitor, e.g. after its profile or db changed"""
+    global _monitor
+    with _monitor_lock:
+        _monitor = None
@@ -1,48 +1,128 @@
 from datetime import datetime
+import threading
+import logging
 from database.activity_db import ActivityDatabase
-from .browser_monitor import FirefoxMonitor
-import sqlite3
+from database.write_queue import WriteBehindQueue
+from .services import get_monitor
+from .access_watcher import BlockedAccessWatcher, DEFAULT_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
 
 class SessionTracker:
-    def __init__(self):
-        self.db = ActivityDatabase()
-        self.firefox_monitor = FirefoxMonitor()
+    def __init__(self, on_attempts=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 write_behind=False, notify=None, db=None):
+        """
+        on_attempts is called from the watcher thread with each list of
+        blocked access attempts found while a session is running.
+
+        With write_behind, database writes go through a WriteBehindQueue
+        and never block the caller; notify is how the queue hands
+        completion callbacks back (e.g. to the Tk thread).
+        db defaults to an ActivityDatabase on productivity.db.
+        """
+        self.db = db if db is not None else ActivityDatabase()
+        self.writer = WriteBehindQueue(self.db, notify) if write_behind else None
         self.session_start_time = None
+        # The id is filled in by the writer once the session row exists;
+        # queued writes read it from here when they run
+        self._session = None
+        self.on_attempts = on_attempts
+        self.poll_interval = poll_interval
+        self.watcher = None
+        self.attempts = []
+        self._attempts_lock = threading.Lock()
+
+    @property
+    def firefox_monitor(self):
+        # Shared with the rest of the app and only built when first needed
+        return get_monitor(self.db)
+
+    @property
+    def session_id(self):
+        return self._session['id'] if self._session else None
+
+    def _write(self, operation, callback=None):
+        if self.writer:
+            self.writer.submit(operation, callback)
+            return
+        result = operation()
+        if callback:
+            callback(result, None)
         
-    def start_session(self):
+    def start_session(self, callback=None):
+        """
+        callback, if given, gets (session_id, error) once the row is written.
+        Starting while a session runs replaces it: its watcher is stopped
+        here, and end_session closes every open session row.
+        """
+        if self.watcher:
+            logger.info("Session already running, restarting it")
+            self.watcher.stop()
+            self.watcher = None
         self.session_start_time = datetime.now()
-        conn = sqlite3.connect(self.db.db_path)
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO productive_sessions (start_time, date)
-            VALUES (?, ?)
-        ''', (self.session_start_time, self.session_start_time.date()))
-        conn.commit()
-        conn.close()
+        session = self._session = {'id': None}
+
+        def insert(start_time=self.session_start_time):
+            session['id'] = self.db.start_session(start_time)
+            return session['id']
+        self._write(insert, callback)
+
+        with self._attempts_lock:
+            self.attempts = []
+        self.watcher = BlockedAccessWatcher(
+            self.firefox_monitor, self.session_start_time,
+            self._record_attempts, poll_interval=self.poll_interval)
+        self.watcher.start()
+
+    def _record_attempts(self, attempts):
+        # One transaction per scan, so the watcher never writes per visit
+        session = self._session
+        self._write(lambda: self.db.record_attempts(session['id'] if session else None, attempts))
+        with self._attempts_lock:
+            self.attempts.extend(attempts)
+        if self.on_attempts:
+            self.on_attempts(attempts)
         
-    def end_session(self):
+    def end_session(self, on_attempt=None, callback=None, cancel=None):
+        """
+        Close the running session and return the blocked access attempts
+        made during it. Most of them have already been found by the
+        watcher; only history written since its last poll is scanned here.
+        on_attempt, if given, is called with each attempt from that scan;
+        callback gets (closed_count, error) once the session row is updated.
+        Setting the cancel event cuts the final scan short.
+        """
         if not self.session_start_time:
-            print("No active session to end")  # Debug print
+            logger.debug("No active session to end")
             return []
             
-        print(f"Ending session that started at: {self.session_start_time}")  # Debug print
+        logger.debug("Ending session that started at: %s", self.session_start_time)
         
-        # Check for blocked site attempts
-        attempts = self.firefox_monitor.check_blocked_access(self.session_start_time)
-        print(f"Found {len(attempts)} attempts during session")  # Debug print
+        # Check for blocked site attempts not yet seen by the watcher
+        if self.watcher:
+            self.watcher.stop()
+            for attempt in self.watcher.scan_if_changed(cancel):
+                if on_attempt:
+                    on_attempt(attempt)
+            self.watcher = None
+        with self._attempts_lock:
+            attempts = self.attempts
+            self.attempts = []
+        logger.info("Found %d blocked attempts during session", len(attempts))
         
         # Regular session end logic
-        conn = sqlite3.connect(self.db.db_path)
-        c = conn.cursor()
-        current_time = datetime.now()
-        c.execute('''
-            UPDATE productive_sessions 
-            SET end_time = ?, 
-                duration = ROUND((julianday(?) - julianday(start_time)) * 24 * 60)
-            WHERE end_time IS NULL
-        ''', (current_time, current_time))
-        conn.commit()
-        conn.close()
+        end_time = datetime.now()
+        self._write(lambda: self.db.end_session(end_time), callback)
         
         self.session_start_time = None
+        self._session = None
         return attempts
+
+    def close(self):
+        """Stop background work and commit every queued write"""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        if self.writer:
+            self.writer.close()
+        self.db.close()
@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _run_in_tmp_path(tmp_path, monkeypatch):
+    """
+    Run every test from its own temp directory, so code that defaults to
+    productivity.db or blocklist.db in the working directory (a bare
+    FirefoxMonitor(), say) never writes into the repository.
+    """
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,186 @@
+import threading
+from datetime import datetime, timedelta
+from database.activity_db import ActivityDatabase
+
+
+def test_uses_wal_journal(tmp_path):
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    with db.transaction() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert conn.execute("PRAGMA synchronous").fetchone() == (1,)  # NORMAL
+    db.close()
+
+
+def test_start_and_end_session(tmp_path):
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    start = datetime.now() - timedelta(minutes=30)
+    session_id = db.start_session(start)
+    assert session_id == 1
+    assert db.get_completed_sessions() == []
+
+    assert db.end_session(start + timedelta(minutes=30)) == 1
+    (date, start_time, duration), = db.get_completed_sessions()
+    assert date == start.date().isoformat()
+    assert duration == 30
+    assert db.get_daily_totals() == [(date, 30)]
+    db.close()
+
+
+def test_reads_are_not_blocked_by_an_open_write(tmp_path):
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    db.start_session(datetime.now())
+    read_done = threading.Event()
+
+    def read():
+        db.get_scan_cursor("profile")
+        read_done.set()
+
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO productive_sessions (start_time) VALUES ('x')")
+        reader = threading.Thread(target=read)
+        reader.start()
+        assert read_done.wait(timeout=2)
+    reader.join()
+    db.close()
+
+
+def test_migrates_legacy_text_timestamps(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "productivity.db")
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE productive_sessions (
+        id INTEGER PRIMARY KEY, start_time TIMESTAMP, end_time TIMESTAMP,
+        duration INTEGER, date DATE)''')
+    conn.execute("INSERT INTO productive_sessions VALUES "
+                 "(1, '2024-01-02 09:00:00.500000', '2024-01-02 09:45:00', 45, '2024-01-02')")
+    conn.execute("INSERT INTO productive_sessions (start_time, date) "
+                 "VALUES ('2024-01-03 10:00:00', '2024-01-03')")
+    conn.commit()
+    conn.close()
+
+    db = ActivityDatabase(path)
+    with db.transaction() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] >= 2
+        start, end = conn.execute(
+            "SELECT start_time, end_time FROM productive_sessions WHERE id = 1").fetchone()
+    assert start == int(datetime(2024, 1, 2, 9, 0, 0, 500000).timestamp() * 1000000)
+    assert end == int(datetime(2024, 1, 2, 9, 45).timestamp() * 1000000)
+
+    assert db.end_session(datetime(2024, 1, 3, 10, 30)) == 1
+    with db.transaction() as conn:
+        assert conn.execute(
+            "SELECT duration FROM productive_sessions WHERE id = 2").fetchone() == (30,)
+    db.close()
+
+
+def test_session_queries_use_indexes(tmp_path):
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    with db.transaction() as conn:
+        close_plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN UPDATE productive_sessions SET end_time = 1 WHERE end_time IS NULL"))
+        stats_plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT date, start_time, duration FROM productive_sessions "
+            "WHERE date >= '2024-01-01' AND duration IS NOT NULL"))
+    assert "idx_sessions_open" in close_plan
+    assert "idx_sessions_date" in stats_plan
+    db.close()
+
+
+def test_end_session_keeps_daily_rollup_current(tmp_path):
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    morning = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+    for start, minutes in ((morning, 20), (morning.replace(hour=14), 50)):
+        db.start_session(start)
+        db.end_session(start + timedelta(minutes=minutes))
+
+    day = morning.date().isoformat()
+    expected = [(day, 2, 70, 20, 50,
+                 int(morning.timestamp() * 1000000),
+                 int(morning.replace(hour=14, minute=50).timestamp() * 1000000))]
+    assert db.get_daily_rollup(since=day) == expected
+    assert db.get_daily_totals() == [(day, 70)]
+
+    # The backfill produces the same rows as the incremental path
+    assert db.rebuild_daily_rollup() == 1
+    assert db.get_daily_rollup() == expected
+    db.close()
+
+
+def test_record_attempts_interns_domains_and_deduplicates(tmp_path):
+    from models.browser_monitor import BlockedAttempt
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    session_id = db.start_session(datetime.now())
+    visit_time = datetime.now()
+    attempts = [
+        BlockedAttempt("https://www.youtube.com/watch?v=1", visit_time, "work", 10),
+        BlockedAttempt("https://youtube.com/", visit_time, "work", 11),
+        BlockedAttempt("https://reddit.com/r/python", visit_time, "personal", 10),
+    ]
+    assert db.record_attempts(session_id, attempts) == 3
+    # A later scan reporting the same visits again stores nothing new
+    assert db.record_attempts(session_id, attempts[:2]) == 0
+
+    with db.transaction() as conn:
+        assert conn.execute("SELECT name FROM domains ORDER BY name").fetchall() == [
+            ("reddit.com",), ("youtube.com",)]
+        assert conn.execute(
+            "SELECT path FROM access_attempts WHERE visit_id = 10 AND profile = 'work'"
+        ).fetchone() == ("/watch?v=1",)
+
+    week = visit_time.strftime("%Y-%W")
+    assert db.get_attempts_per_domain_per_week() == [
+        ("reddit.com", week, 1), ("youtube.com", week, 2)]
+    db.close()
+
+
+def test_write_behind_queue_groups_commits_and_isolates_failures(tmp_path):
+    from database.write_queue import WriteBehindQueue
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    statements = []
+    db._writer.set_trace_callback(statements.append)
+    notified = []
+    writer = WriteBehindQueue(db, notify=notified.append)
+
+    entered, gate = threading.Event(), threading.Event()
+    writer.submit(lambda: entered.set() or gate.wait())
+    assert entered.wait(timeout=2)
+    results = []
+    for minute in range(5):
+        writer.submit(lambda m=minute: db.start_session(datetime(2024, 1, 1, 9, m)),
+                      lambda result, error: results.append((result, error)))
+    writer.submit(lambda: 1 / 0, lambda result, error: results.append((result, type(error))))
+    gate.set()
+    writer.close()
+
+    # Everything queued behind the gate went out in one commit
+    assert statements.count("COMMIT") == 2
+    for callback in notified:
+        callback()
+    assert results == [(i, None) for i in range(1, 6)] + [(None, ZeroDivisionError)]
+    assert len(db.get_completed_sessions(days=100000)) == 0
+    with db.transaction() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM productive_sessions").fetchone() == (5,)
+    db.close()
+
+
+def test_concurrent_end_session_counts_a_session_once(tmp_path):
+    path = str(tmp_path / "productivity.db")
+    gui, cli = ActivityDatabase(path), ActivityDatabase(path)
+    start = datetime.now() - timedelta(minutes=10)
+    gui.start_session(start)
+    end = start + timedelta(minutes=10)
+
+    # The other process ends the session while this one holds the
+    # transaction but hasn't written yet
+    results = []
+    with gui.transaction():
+        other = threading.Thread(target=lambda: results.append(cli.end_session(end)))
+        other.start()
+        other.join(timeout=0.3)
+        assert other.is_alive()
+    other.join(timeout=5)
+    assert results == [1]
+    assert gui.end_session(end) == 0
+    assert gui.get_daily_totals() == [(start.date().isoformat(), 10)]
+    gui.close()
+    cli.close()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from api.server import ApiServer
+from database.activity_db import ActivityDatabase
+
+
+def _server(tmp_path):
+    hosts = tmp_path / 'hosts'
+    hosts.write_text("127.0.0.1 localhost\n")
+    monitor = Mock(firefox_path=None)
+    monitor.hosts_blocker.hosts_path = str(hosts)
+    monitor.hosts_blocker.is_blocked.return_value = False
+    monitor.check_blocking_status.return_value = 'report'
+    tracker = Mock(db=ActivityDatabase(str(tmp_path / 'api.db')), firefox_monitor=monitor)
+    return ApiServer(tracker, port=0)
+
+
+async def _get(server, target, etag=None):
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    request = f"GET {target} HTTP/1.1\r\nHost: localhost\r\n"
+    if etag:
+        request += f"If-None-Match: {etag}\r\n"
+    writer.write((request + "\r\n").encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    lines = head.decode().split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, json.loads(body) if body else None
+
+
+def _add_session(db, minutes):
+    start = datetime.now() - timedelta(minutes=minutes)
+    db.start_session(start)
+    db.end_session(datetime.now())
+
+
+def test_etag_revalidation(tmp_path):
+    server = _server(tmp_path)
+    db = server.db
+
+    async def scenario():
+        await server.start()
+        _add_session(db, 30)
+        status, headers, body = await _get(server, '/sessions')
+        assert status == 200 and [s['minutes'] for s in body] == [30]
+        etag = headers['ETag']
+
+        status, headers, body = await _get(server, '/sessions', etag)
+        assert status == 304 and headers['ETag'] == etag and body is None
+
+        # A commit from another connection changes data_version
+        other = ActivityDatabase(db.db_path)
+        _add_session(other, 10)
+        other.close()
+        status, headers, body = await _get(server, '/sessions', etag)
+        assert status == 200 and headers['ETag'] != etag
+        assert sorted(s['minutes'] for s in body) == [10, 30]
+
+        status, _, body = await _get(server, '/rollup?by=week')
+        assert status == 200 and body[0]['sessions'] == 2
+        status, _, body = await _get(server, '/status')
+        assert body['hosts_blocking'] is False and body['session'] is None
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.close()
+        db.close()
+
+
+def test_bad_requests(tmp_path):
+    server = _server(tmp_path)
+
+    async def scenario():
+        await server.start()
+        assert (await _get(server, '/nope'))[0] == 404
+        assert (await _get(server, '/sessions?from=yesterday'))[0] == 400
+        assert (await _get(server, '/rollup?by=year'))[0] == 400
+        status, _, body = await _get(server, '/attempts?days=7')
+        assert status == 200 and body == []
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.close()
+        server.db.close()
+
+
+def test_response_cache_is_bounded(tmp_path):
+    from api import server as api_server
+    server = _server(tmp_path)
+
+    async def scenario():
+        await server.start()
+        _, first, _ = await _get(server, '/attempts?days=5&x=1')
+        # Same parameters in another order hit the same entry and tag
+        _, again, _ = await _get(server, '/attempts?x=1&days=5')
+        assert again['ETag'] == first['ETag']
+        for days in range(api_server.MAX_CACHED_RESPONSES * 2):
+            await _get(server, f'/attempts?days={days}')
+        assert len(server._cache) == api_server.MAX_CACHED_RESPONSES
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.close()
+        server.db.close()
@@ -0,0 +1,122 @@
+from models.blocklist_matcher import BlocklistMatcher, get_default_matcher, split_blocked_sites
+
+
+def test_split_blocked_sites_normalizes_entries():
+    hosts, patterns = split_blocked_sites([
+        "https://www.youtube.com/", "www.reddit.com", "Twitch.tv", "/r/", "example.com/shorts",
+    ])
+    assert hosts == {"youtube.com", "reddit.com", "twitch.tv"}
+    assert patterns == {"/r/", "example.com/shorts"}
+
+
+def test_host_rules_cover_subdomains_only():
+    matcher = BlocklistMatcher(["youtube.com"])
+    assert matcher.matches("https://youtube.com")
+    assert matcher.matches("https://M.YouTube.com/watch?v=1")
+    assert matcher.matches("youtube.com")
+    assert not matcher.matches("https://notyoutube.com/")
+    assert not matcher.matches("https://example.com/?q=youtube.com")
+
+
+def test_substring_rules_match_anywhere_in_url():
+    matcher = BlocklistMatcher(["/r/", "/abcz", "c/dd"])
+    assert matcher.matches("https://github.com/r/repo")
+    # Needs the failure link from "/abc" to "c" to reach "c/dd"
+    assert matcher.matches("https://example.com/abc/dd")
+    assert not matcher.matches("https://example.com/abc/d")
+
+
+def test_default_matcher_is_shared():
+    from models.browser_monitor import FirefoxMonitor
+    monitor = FirefoxMonitor()
+    assert monitor.matcher is get_default_matcher()
+    assert monitor.hosts_blocker.matcher is monitor.matcher
+    assert monitor.firefox_blocker.matcher is monitor.matcher
+    assert "www.youtube.com" in monitor.hosts_blocker.blocked_sites
+
+
+def _import_lists(tmp_path):
+    from models.blocklist_store import BlocklistStore
+    hosts_list = tmp_path / "hosts.txt"
+    hosts_list.write_text(
+        "# StevenBlack-style hosts list\n"
+        "127.0.0.1 localhost\n"
+        "0.0.0.0 0.0.0.0\n"
+        "0.0.0.0 ads.example.com tracker.example.net  # two names\n"
+        "0.0.0.0 Ads.Example.com.\n"
+        ":: ipv6.example.org\n")
+    plain_list = tmp_path / "domains.txt"
+    plain_list.write_text("! adblock comment\n||adblock.example.org^\nbad..name\nexample.net\nbücher.example\n")
+
+    store = BlocklistStore(str(tmp_path / "blocklist.db"))
+    assert store.import_file(str(hosts_list)) == 3
+    assert store.import_file(str(plain_list)) == 3
+    # Re-importing a list replaces its own entries instead of adding more
+    assert store.import_file(str(hosts_list)) == 3
+    assert len(store) == 6
+    return store
+
+
+def test_blocklist_store_import_normalizes_and_dedupes(tmp_path):
+    store = _import_lists(tmp_path)
+    assert sorted(store.iter_hosts()) == [
+        "adblock.example.org", "ads.example.com", "example.net",
+        "ipv6.example.org", "tracker.example.net", "xn--bcher-kva.example"]
+    store.close()
+
+
+def test_matcher_looks_up_imported_hosts(tmp_path):
+    store = _import_lists(tmp_path)
+    matcher = BlocklistMatcher(["youtube.com"], store)
+    assert matcher.matches("https://cdn.ads.example.com/x.js")
+    assert matcher.matches("https://example.net/")
+    assert matcher.host_blocked("deep.tracker.example.net")
+    assert matcher.matches("https://youtube.com/")
+    assert not matcher.matches("https://example.com/")
+    assert not matcher.host_blocked("net")
+    assert "ads.example.com" in set(matcher.imported_host_entries())
+    store.close()
+
+
+def test_domain_shared_by_two_lists_outlives_either(tmp_path):
+    from models.blocklist_store import BlocklistStore
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("shared.example\nonly-a.example\n")
+    b.write_text("shared.example\n")
+    store = BlocklistStore(str(tmp_path / "blocklist.db"))
+    store.import_file(str(a))
+    store.import_file(str(b))
+    assert len(store) == 2
+
+    a.write_text("only-a.example\n")
+    assert store.import_file(str(a)) == 1
+    assert store.host_blocked("shared.example")
+
+    b.write_text("")
+    store.import_file(str(b))
+    assert not store.host_blocked("shared.example")
+    assert list(store.iter_hosts()) == ["only-a.example"]
+    store.close()
+
+
+def test_store_from_before_memberships_is_migrated(tmp_path):
+    import sqlite3
+    from models.blocklist_store import BlocklistStore
+    path = str(tmp_path / "blocklist.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE blocklist_sources (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, "
+                 "imported_at INTEGER, domain_count INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("CREATE TABLE blocked_hosts (rev_host TEXT PRIMARY KEY, source_id INTEGER NOT NULL) "
+                 "WITHOUT ROWID")
+    conn.execute("INSERT INTO blocklist_sources (id, path, domain_count) VALUES (1, '/old.txt', 1)")
+    conn.execute("INSERT INTO blocked_hosts VALUES ('elpmaxe.dlo.', 1)")
+    conn.commit()
+    conn.close()
+
+    store = BlocklistStore(path)
+    shared = tmp_path / "new.txt"
+    shared.write_text("old.example\n")
+    assert store.import_file(str(shared)) == 1
+    assert list(store.iter_hosts()) == ["old.example"]
+    assert len(store) == 1
+    store.close()
@@ -5,6 +5,7 @@ from unittest.mock import patch, Mock
 from datetime import datetime
 import tempfile
 import sqlite3
+import time
 
 def test_firefox_monitor_initialization():
     monitor = FirefoxMonitor()
@@ -208,3 +209,325 @@ def test_block_sites_firefox_exception():
             # Verify that both methods were called
             monitor.firefox_blocker.block_sites.assert_called_once()
             monitor.hosts_blocker.block_websites.assert_called_once()
+
+def test_check_blocked_access_is_incremental(tmp_path):
+    from database.activity_db import ActivityDatabase
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+
+    places_path = str(tmp_path / "places.sqlite")
+    conn = sqlite3.connect(places_path)
+    c = conn.cursor()
+    c.execute('''CREATE TABLE moz_places
+                (id INTEGER PRIMARY KEY, url TEXT)''')
+    c.execute('''CREATE TABLE moz_historyvisits
+                (id INTEGER PRIMARY KEY, place_id INTEGER, visit_date INTEGER)''')
+    c.execute("INSERT INTO moz_places (id, url) VALUES (1, 'https://youtube.com')")
+    c.execute("INSERT INTO moz_places (id, url) VALUES (2, 'https://reddit.com/r/python')")
+
+    start_time = datetime.now()
+    visit_micro = int(start_time.timestamp() * 1000000) + 1000000
+    c.execute("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (1, ?)", (visit_micro,))
+    conn.commit()
+
+    monitor.firefox_path = places_path
+    first = monitor.check_blocked_access(start_time)
+    assert [a.url for a in first] == ['https://youtube.com']
+
+    # Nothing new since the last scan
+    assert monitor.check_blocked_access(start_time) == []
+
+    # Only the visit added after the previous scan is reported
+    c.execute("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (2, ?)", (visit_micro + 1,))
+    conn.commit()
+    conn.close()
+    second = monitor.check_blocked_access(start_time)
+    assert [a.url for a in second] == ['https://reddit.com/r/python']
+
+    # The cursor is persisted in productivity.db
+    assert monitor.db.get_scan_cursor(places_path) == (2, visit_micro + 1)
+
+def test_places_snapshot_sees_wal_and_leaves_profile_untouched(tmp_path):
+    from models.places_snapshot import places_snapshot
+    places_path = str(tmp_path / "places.sqlite")
+    conn = sqlite3.connect(places_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("CREATE TABLE moz_historyvisits (id INTEGER PRIMARY KEY, visit_date INTEGER)")
+    conn.execute("INSERT INTO moz_historyvisits (visit_date) VALUES (1)")
+    conn.commit()
+    # Firefox keeps the database open, so the visit is still only in the WAL
+    assert os.path.getsize(places_path + "-wal") > 0
+
+    with places_snapshot(places_path, pages_per_step=1) as snapshot:
+        assert snapshot.execute("SELECT COUNT(*) FROM moz_historyvisits").fetchone() == (1,)
+
+    conn.close()
+    assert not any(name.endswith("-temp") for name in os.listdir(tmp_path))
+
+def _create_places_db(path, urls, visit_date):
+    """Minimal places.sqlite with Firefox's rev_host column and indexes"""
+    from urllib.parse import urlsplit
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, rev_host TEXT)")
+    conn.execute("CREATE INDEX moz_places_hostindex ON moz_places (rev_host)")
+    conn.execute("CREATE TABLE moz_historyvisits (id INTEGER PRIMARY KEY, place_id INTEGER, visit_date INTEGER)")
+    conn.execute("CREATE INDEX moz_historyvisits_placedateindex ON moz_historyvisits (place_id, visit_date)")
+    conn.execute("CREATE INDEX moz_historyvisits_dateindex ON moz_historyvisits (visit_date)")
+    for place_id, url in enumerate(urls, start=1):
+        rev_host = urlsplit(url).hostname[::-1] + '.'
+        conn.execute("INSERT INTO moz_places (id, url, rev_host) VALUES (?, ?, ?)", (place_id, url, rev_host))
+        conn.execute("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (?, ?)", (place_id, visit_date))
+    conn.commit()
+    conn.close()
+
+def test_check_blocked_access_filters_in_sql_by_rev_host(tmp_path):
+    from database.activity_db import ActivityDatabase
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    start_time = datetime.now()
+    places_path = str(tmp_path / "places.sqlite")
+    _create_places_db(places_path, [
+        'https://m.youtube.com/watch?v=1',
+        'https://notyoutube.com/',
+        'https://example.com/?q=youtube.com',
+        'https://github.com/r/some-repo',
+        'https://docs.python.org/',
+    ], int(start_time.timestamp() * 1000000) + 1000000)
+
+    monitor.firefox_path = places_path
+    urls = sorted(a.url for a in monitor.check_blocked_access(start_time))
+    assert urls == ['https://github.com/r/some-repo', 'https://m.youtube.com/watch?v=1']
+
+def test_iter_blocked_access_streams_in_batches(tmp_path):
+    from database.activity_db import ActivityDatabase
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    start_time = datetime.now()
+    places_path = str(tmp_path / "places.sqlite")
+    urls = [f'https://youtube.com/watch?v={i}' for i in range(5)]
+    _create_places_db(places_path, urls, int(start_time.timestamp() * 1000000) + 1000000)
+    monitor.firefox_path = places_path
+
+    scan = monitor.iter_blocked_access(start_time, batch_size=2)
+    attempt = next(scan)
+    assert attempt.url in urls and isinstance(attempt.visit_time, datetime)
+    assert attempt.profile == places_path
+    # Stopping early must not advance the cursor past unreported visits
+    scan.close()
+    assert monitor.db.get_scan_cursor(places_path) == (0, 0)
+
+    assert len(list(monitor.iter_blocked_access(start_time, batch_size=2))) == 5
+    assert monitor.check_blocked_access(start_time) == []
+
+def test_all_profiles_from_profiles_ini_are_scanned(tmp_path):
+    from database.activity_db import ActivityDatabase
+    firefox_root = tmp_path / ".mozilla" / "firefox"
+    start_time = datetime.now()
+    visit_date = int(start_time.timestamp() * 1000000) + 1000000
+    for name, url in (("abc.work", "https://reddit.com/"), ("xyz.default-release", "https://twitch.tv/")):
+        (firefox_root / name).mkdir(parents=True)
+        _create_places_db(str(firefox_root / name / "places.sqlite"), [url], visit_date)
+    (firefox_root / "profiles.ini").write_text(
+        "[Profile1]\nName=work\nIsRelative=1\nPath=abc.work\n\n"
+        "[Profile0]\nName=default-release\nIsRelative=1\nPath=xyz.default-release\n\n"
+        "[Install4F96D1932A9F858E]\nDefault=xyz.default-release\nLocked=1\n"
+    )
+
+    with patch('platform.system', return_value="Linux"), \
+            patch('os.path.expanduser', return_value=str(firefox_root)):
+        monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+
+    assert monitor.profile_paths == [
+        str(firefox_root / "xyz.default-release" / "places.sqlite"),
+        str(firefox_root / "abc.work" / "places.sqlite"),
+    ]
+    urls = sorted(a.url for a in monitor.check_blocked_access(start_time))
+    assert urls == ["https://reddit.com/", "https://twitch.tv/"]
+
+def test_watcher_scans_only_when_history_changes(tmp_path):
+    from database.activity_db import ActivityDatabase
+    from models.access_watcher import BlockedAccessWatcher
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    start_time = datetime.now()
+    places_path = str(tmp_path / "places.sqlite")
+    visit_date = int(start_time.timestamp() * 1000000) + 1000000
+    _create_places_db(places_path, ['https://youtube.com/'], visit_date)
+    monitor.firefox_path = places_path
+
+    found = []
+    watcher = BlockedAccessWatcher(monitor, start_time, found.extend)
+    assert [a.url for a in watcher.scan_if_changed()] == ['https://youtube.com/']
+
+    with patch.object(monitor, 'iter_blocked_access') as scan:
+        assert watcher.scan_if_changed() == []
+        scan.assert_not_called()
+
+    conn = sqlite3.connect(places_path)
+    conn.execute("INSERT INTO moz_places (id, url, rev_host) VALUES (2, 'https://twitch.tv/', 'vt.hctiwt.')")
+    conn.execute("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (2, ?)", (visit_date,))
+    conn.commit()
+    conn.close()
+    assert [a.url for a in watcher.scan_if_changed()] == ['https://twitch.tv/']
+    assert [a.url for a in found] == ['https://youtube.com/', 'https://twitch.tv/']
+
+def test_scan_logs_one_summary_record(tmp_path, caplog):
+    import logging
+    from database.activity_db import ActivityDatabase
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    start_time = datetime.now()
+    places_path = str(tmp_path / "places.sqlite")
+    urls = ['https://youtube.com/', 'https://docs.python.org/', 'https://twitch.tv/']
+    _create_places_db(places_path, urls, int(start_time.timestamp() * 1000000) + 1000000)
+    monitor.firefox_path = places_path
+
+    with caplog.at_level(logging.INFO, logger="models"):
+        monitor.check_blocked_access(start_time)
+
+    summaries = [r for r in caplog.records
+                 if r.name == "models.browser_monitor" and r.getMessage().startswith("Scanned")]
+    assert len(summaries) == 1
+    assert "2 matches" in summaries[0].getMessage()
+    assert monitor.scan_stats['scans'] == 1
+    assert monitor.scan_stats['matches'] == 2
+
+
+def test_shared_monitor_is_built_once(monkeypatch):
+    from models import browser_monitor, services
+    built = []
+    monkeypatch.setattr(browser_monitor, 'FirefoxMonitor', lambda db: built.append(db) or object())
+    services.reset_monitor()
+    try:
+        monitor = services.get_monitor('db')
+        assert services.get_monitor() is monitor
+        assert built == ['db']
+    finally:
+        services.reset_monitor()
+
+
+def test_gui_import_skips_matplotlib():
+    import subprocess, sys
+    code = "import sys, gui.app; print('matplotlib' in sys.modules, 'pandas' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.split() == ['False', 'False'], result.stderr
+
+def test_scan_matches_imported_blocklists(tmp_path):
+    from database.activity_db import ActivityDatabase
+    from models.blocklist_matcher import BlocklistMatcher
+    from models.blocklist_store import BlocklistStore
+    domains = tmp_path / "domains.txt"
+    domains.write_text("ads.example.com\n")
+    store = BlocklistStore(str(tmp_path / "blocklist.db"))
+    store.import_file(str(domains))
+
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    monitor.matcher = BlocklistMatcher(["youtube.com"], store)
+    start_time = datetime.now()
+    places_path = str(tmp_path / "places.sqlite")
+    _create_places_db(places_path, [
+        'https://cdn.ads.example.com/pixel.gif',
+        'https://example.com/',
+        'https://youtube.com/',
+    ], int(start_time.timestamp() * 1000000) + 1000000)
+
+    monitor.firefox_path = places_path
+    urls = sorted(a.url for a in monitor.check_blocked_access(start_time))
+    assert urls == ['https://cdn.ads.example.com/pixel.gif', 'https://youtube.com/']
+    store.close()
+
+def test_closing_a_multi_profile_scan_keeps_unread_attempts(tmp_path):
+    from database.activity_db import ActivityDatabase
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    start_time = datetime.now()
+    visit_date = int(start_time.timestamp() * 1000000) + 1000000
+    monitor.profile_paths = []
+    for name in ("a", "b"):
+        places_path = str(tmp_path / f"{name}.sqlite")
+        _create_places_db(places_path, [f'https://youtube.com/{name}/{i}' for i in range(2)],
+                          visit_date)
+        monitor.profile_paths.append(places_path)
+
+    scan = monitor.iter_blocked_access(start_time, batch_size=1)
+    first = next(scan)
+    # Give the workers time to finish their profiles before stopping
+    time.sleep(0.2)
+    scan.close()
+
+    # Neither profile was consumed to the end, so no cursor moved and
+    # nothing is lost
+    rescanned = monitor.check_blocked_access(start_time)
+    assert first in rescanned
+    assert sorted(a.url for a in rescanned) == [
+        f'https://youtube.com/{name}/{i}' for name in ("a", "b") for i in range(2)]
+    assert monitor.check_blocked_access(start_time) == []
+
+def test_repeated_multi_profile_scans_reuse_connections(tmp_path):
+    from database.activity_db import ActivityDatabase
+    monitor = FirefoxMonitor(ActivityDatabase(str(tmp_path / "productivity.db")))
+    start_time = datetime.now()
+    monitor.profile_paths = []
+    for name in ("a", "b"):
+        places_path = str(tmp_path / f"{name}.sqlite")
+        _create_places_db(places_path, ['https://youtube.com/'], int(start_time.timestamp() * 1000000))
+        monitor.profile_paths.append(places_path)
+
+    for _ in range(20):
+        monitor.check_blocked_access(start_time)
+    # Only the consuming thread touches productivity.db
+    assert len(monitor.db._readers) == 1
+
+def test_places_reader_reads_in_place_unless_firefox_locks_it(tmp_path):
+    from models import places_snapshot as snapshots
+    places_path = str(tmp_path / "places.sqlite")
+    _create_places_db(places_path, ['https://youtube.com/'], 1)
+
+    with patch.object(snapshots, 'places_snapshot', wraps=snapshots.places_snapshot) as copy:
+        with snapshots.places_reader(places_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM moz_historyvisits").fetchone() == (1,)
+        copy.assert_not_called()
+
+        # Firefox keeps places.sqlite under an exclusive lock while it writes
+        firefox = sqlite3.connect(places_path)
+        firefox.execute("PRAGMA locking_mode=EXCLUSIVE")
+        firefox.execute("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (1, 2)")
+        firefox.commit()
+        started = time.perf_counter()
+        with snapshots.places_reader(places_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM moz_historyvisits").fetchone() == (2,)
+        # One lock probe without waiting, then a straight copy
+        assert time.perf_counter() - started < 0.5
+        copy.assert_called_once()
+        firefox.close()
+
+def test_second_start_stops_the_first_watcher(tmp_path):
+    import threading
+    from database.activity_db import ActivityDatabase
+    from models.session import SessionTracker
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    monitor = Mock(profile_paths=[])
+    monitor.iter_blocked_access.side_effect = lambda *args, **kwargs: iter(())
+    with patch('models.session.get_monitor', return_value=monitor):
+        tracker = SessionTracker(db=db, poll_interval=0.01)
+        tracker.start_session()
+        tracker.start_session()
+        tracker.end_session()
+    watchers = [t for t in threading.enumerate() if t.name == 'blocked-access-watcher']
+    assert watchers == []
+    assert db.get_open_session() is None
+    tracker.close()
+
+def test_session_watchers_release_their_connections(tmp_path):
+    from database.activity_db import ActivityDatabase
+    from models.session import SessionTracker
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    monitor = FirefoxMonitor(db)
+    places_path = str(tmp_path / "places.sqlite")
+    _create_places_db(places_path, ['https://youtube.com/'], int(datetime.now().timestamp() * 1000000))
+    monitor.firefox_path = places_path
+    with patch('models.session.get_monitor', return_value=monitor):
+        tracker = SessionTracker(db=db, poll_interval=0.01)
+        for _ in range(10):
+            tracker.start_session()
+            time.sleep(0.02)
+            tracker.end_session()
+    # Only the thread that ended the sessions keeps a reader
+    assert len(db._readers) <= 1
+    tracker.close()
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch, Mock
+import cli
+from models.browser_monitor import BlockedAttempt
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_start_end_and_stats(tmp_path, capsys):
+    db_path = str(tmp_path / 'cli.db')
+    attempt = BlockedAttempt('https://youtube.com/', datetime.now(), 'p', 1)
+    monitor = Mock()
+    monitor.check_blocked_access.return_value = [attempt]
+
+    assert cli.main(['--db', db_path, 'start']) == 0
+    assert cli.main(['--db', db_path, 'start']) == 1
+    with patch('cli._monitor', return_value=monitor):
+        assert cli.main(['--db', db_path, 'end']) == 0
+    assert cli.main(['--db', db_path, 'end']) == 1
+    assert 'https://youtube.com/' in capsys.readouterr().out
+
+    assert cli.main(['--db', db_path, 'stats', '--json']) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert [day['sessions'] for day in stats['days']] == [1]
+
+
+def test_hosts_status_reads_hosts_file(tmp_path, capsys):
+    hosts = tmp_path / 'hosts'
+    hosts.write_text("127.0.0.1 localhost\n127.0.0.1 youtube.com\n")
+    with patch('models.hosts_blocker.get_hosts_path', return_value=str(hosts)):
+        assert cli.main(['status', '--hosts']) == 0
+    assert 'Active' in capsys.readouterr().out
+
+
+def test_cli_never_imports_gui_libraries(tmp_path):
+    code = ("import sys, cli; cli.main(['--db', sys.argv[1], 'stats', '--json']); "
+            "print([m for m in ('tkinter', 'matplotlib', 'pandas') if m in sys.modules])")
+    result = subprocess.run([sys.executable, '-c', code, str(tmp_path / 'cli.db')],
+                            capture_output=True, text=True, cwd=REPO_ROOT)
+    assert result.stdout.strip().endswith('[]'), result.stderr
+
+
+def test_hosts_blocker_still_runs_as_a_script(tmp_path):
+    # The pre-CLI entry point, run from outside the repository
+    result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, 'models', 'hosts_blocker.py'),
+                             '--help'], capture_output=True, text=True, cwd=str(tmp_path))
+    assert result.returncode == 0, result.stderr
+    assert 'unblock' in result.stdout
+
+
+def test_dns_backend_needs_an_explicit_upstream(tmp_path, capsys):
+    monitor = Mock()
+    with patch('cli._monitor', return_value=monitor):
+        assert cli.main(['--db', str(tmp_path / 'cli.db'), 'block', '--backend', 'dns']) == 2
+    assert '--upstream' in capsys.readouterr().out
+    monitor.block_sites.assert_not_called()
@@ -0,0 +1,43 @@
+from datetime import date, datetime, timedelta
+import pytest
+from database.activity_db import ActivityDatabase
+from gui.stats.data_processor import SessionDataProcessor
+
+
+@pytest.fixture
+def processor(tmp_path):
+    db = ActivityDatabase(str(tmp_path / "productivity.db"))
+    # Mon 2024-01-01 .. Wed 2024-01-10, with two sessions on the first day
+    for start, minutes in (
+        (datetime(2024, 1, 1, 9, 0), 30),
+        (datetime(2024, 1, 1, 14, 15), 45),
+        (datetime(2024, 1, 3, 10, 0), 60),
+        (datetime(2024, 1, 10, 8, 0), 20),
+        (datetime(2024, 2, 5, 8, 0), 10),
+    ):
+        db.start_session(start)
+        db.end_session(start + timedelta(minutes=minutes))
+    yield SessionDataProcessor(db)
+    db.close()
+
+
+def test_get_session_data_for_a_range(processor):
+    sessions = processor.get_session_data(date(2024, 1, 1), date(2024, 1, 3))
+    assert sessions['date'].tolist() == ['2024-01-01', '2024-01-01', '2024-01-03']
+    assert sessions['start'].dt.strftime('%H:%M').tolist() == ['09:00', '14:15', '10:00']
+    assert sessions['duration'].tolist() == [30, 45, 60]
+    assert processor.get_session_data(date(2023, 1, 1), date(2023, 1, 2)) is None
+
+
+def test_get_totals_by_granularity(processor):
+    weekly = processor.get_totals('2024-01-01', '2024-02-29', granularity='week')
+    assert [d.isoformat() for d in weekly.index.date] == ['2024-01-01', '2024-01-08', '2024-02-05']
+    assert weekly['minutes'].tolist() == [135, 20, 10]
+    assert weekly['sessions'].tolist() == [3, 1, 1]
+
+    monthly = processor.get_totals('2024-01-01', '2024-02-29', granularity='month')
+    assert monthly['minutes'].tolist() == [155, 10]
+    assert monthly['longest'].tolist() == [60, 10]
+
+    with pytest.raises(ValueError):
+        processor.get_totals(granularity='fortnight')
@@ -0,0 +1,130 @@
+import asyncio
+import socket
+import struct
+from models.dns_sinkhole import (DnsSinkhole, build_query, parse_question, parse_address,
+                                 TYPE_A, TYPE_AAAA)
+
+UPSTREAM_ADDRESS = bytes([93, 184, 216, 34])
+MX = 15
+
+
+class _StubUpstream(asyncio.DatagramProtocol):
+    """Answers every A query with UPSTREAM_ADDRESS"""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.queries = []
+
+    def datagram_received(self, data, addr):
+        _, _, name, qtype, end = parse_question(data)
+        self.queries.append(name)
+        answer = struct.pack('!HHHIH', 0xc00c, qtype, 1, 60, 4) + UPSTREAM_ADDRESS
+        header = struct.pack('!HHHHHH', struct.unpack('!H', data[:2])[0], 0x8180, 1, 1, 0, 0)
+        self.transport.sendto(header + data[12:end] + answer, addr)
+
+
+def _answer(response):
+    """(rcode, answer count, rdata of the first answer)"""
+    flags, _, ancount = struct.unpack_from('!HHH', response, 2)
+    _, _, _, _, end = parse_question(response[:2] + b'\0\0' + response[4:])
+    rdata = response[end + 12:] if ancount else None
+    return flags & 0xf, ancount, rdata
+
+
+async def _ask(port, name, qtype=TYPE_A, query_id=7):
+    loop = asyncio.get_running_loop()
+    reply = loop.create_future()
+
+    class Client(asyncio.DatagramProtocol):
+        def datagram_received(self, data, addr):
+            reply.set_result(data)
+
+    transport, _ = await loop.create_datagram_endpoint(Client, remote_addr=('127.0.0.1', port))
+    transport.sendto(build_query(name, qtype, query_id))
+    try:
+        response = await asyncio.wait_for(reply, 2)
+    finally:
+        transport.close()
+    assert response[:2] == struct.pack('!H', query_id)
+    return _answer(response)
+
+
+def test_sinkhole_blocks_and_forwards():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        upstream_transport, upstream = await loop.create_datagram_endpoint(
+            _StubUpstream, local_addr=('127.0.0.1', 0))
+        sinkhole = DnsSinkhole({'youtube.com', 'ads.example.net'},
+                               upstream=upstream_transport.get_extra_info('sockname'),
+                               listen=('127.0.0.1', 0))
+        await sinkhole.start()
+        port = sinkhole.listen[1]
+        try:
+            assert await _ask(port, 'www.YouTube.com') == (0, 1, bytes(4))
+            assert await _ask(port, 'youtube.com', TYPE_AAAA) == (0, 1, bytes(16))
+            assert await _ask(port, 'cdn.ads.example.net', MX) == (0, 0, None)
+            assert await _ask(port, 'example.net') == (0, 1, UPSTREAM_ADDRESS)
+            assert await _ask(port, 'notyoutube.com', query_id=9) == (0, 1, UPSTREAM_ADDRESS)
+        finally:
+            sinkhole.close()
+            upstream_transport.close()
+        assert upstream.queries == ['example.net', 'notyoutube.com']
+        assert sinkhole.stats['blocked'] == 3 and sinkhole.stats['forwarded'] == 2
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_upstream_gives_servfail():
+    # Bind and release a port so nothing answers on it
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(('127.0.0.1', 0))
+    dead_upstream = probe.getsockname()
+    probe.close()
+
+    async def scenario():
+        sinkhole = DnsSinkhole(set(), upstream=dead_upstream, listen=('127.0.0.1', 0), timeout=0.2)
+        await sinkhole.start()
+        try:
+            rcode, ancount, _ = await _ask(sinkhole.listen[1], 'example.org')
+        finally:
+            sinkhole.close()
+        assert (rcode, ancount) == (2, 0)
+
+    asyncio.run(scenario())
+
+
+def test_block_sites_dns_backend():
+    from models.browser_monitor import FirefoxMonitor
+    monitor = FirefoxMonitor()
+    monitor.dns_listen = ('127.0.0.1', 0)
+    # No resolver is chosen on the user's behalf
+    assert not monitor.block_sites(backend='dns')
+    monitor.dns_upstream = ('127.0.0.1', 5353)
+    assert monitor.block_sites(backend='dns')
+    sinkhole = monitor.dns_sinkhole
+    try:
+        assert sinkhole.running
+        assert sinkhole.is_blocked('m.youtube.com')
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.settimeout(2)
+        client.sendto(build_query('www.reddit.com', query_id=3), sinkhole.listen)
+        assert _answer(client.recv(512)) == (0, 1, bytes(4))
+        client.close()
+    finally:
+        sinkhole.stop()
+    assert not sinkhole.running
+
+
+def test_monitor_import_leaves_asyncio_unloaded():
+    import os, subprocess, sys
+    code = "import sys, models.browser_monitor; print('asyncio' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == 'False', result.stderr
+
+
+def test_parse_address():
+    assert parse_address('9.9.9.9') == ('9.9.9.9', 53)
+    assert parse_address('127.0.0.1:5353') == ('127.0.0.1', 5353)
+    assert parse_address('::1') == ('::1', 53)
+    assert parse_address('[2620:fe::fe]:5353') == ('2620:fe::fe', 5353)
@@ -0,0 +1,55 @@
+import os
+from unittest.mock import patch
+from models.firefox_blocker import FirefoxBlocker, POLICY_HEADER
+
+SITES = ["https://www.youtube.com/", "youtube.com", "reddit.com", "/r/"]
+
+
+def _blocker(tmp_path):
+    return FirefoxBlocker(str(tmp_path / "places.sqlite"), SITES)
+
+
+def test_block_writes_one_sites_pref(tmp_path):
+    blocker = _blocker(tmp_path)
+    assert blocker.block_sites()
+    lines = (tmp_path / "user.js").read_text().splitlines()
+    assert lines[0].startswith(POLICY_HEADER)
+    assert len(lines) == 4
+    sites = [line for line in lines if "blocksites.sites" in line]
+    assert sites == ['user_pref("capability.policy.blocksites.sites", "'
+                     'http://reddit.com https://reddit.com http://www.reddit.com https://www.reddit.com '
+                     'http://youtube.com https://youtube.com http://www.youtube.com https://www.youtube.com");']
+    assert "Enabled" in blocker.check_blocking_status(["youtube.com"])
+
+
+def test_unchanged_policy_is_not_rewritten(tmp_path):
+    blocker = _blocker(tmp_path)
+    blocker.block_sites()
+    with patch('models.firefox_blocker.os.replace') as replace:
+        assert blocker.block_sites()
+    replace.assert_not_called()
+
+    # A different blocklist changes the hash and the file
+    FirefoxBlocker(blocker.firefox_path, ["twitch.tv"]).block_sites()
+    assert "twitch.tv" in (tmp_path / "user.js").read_text()
+
+
+def test_unblock_filters_prefs_js(tmp_path):
+    blocker = _blocker(tmp_path)
+    blocker.block_sites()
+    prefs = tmp_path / "prefs.js"
+    prefs.write_bytes(
+        b'user_pref("browser.startup.page", 3);\r\n'
+        b'user_pref("capability.policy.policynames", "blocksites");\r\n'
+        b'user_pref("general.useragent.locale", "fr");\r\n')
+
+    assert blocker.unblock_sites()
+    assert not (tmp_path / "user.js").exists()
+    assert prefs.read_bytes() == (b'user_pref("browser.startup.page", 3);\r\n'
+                                  b'user_pref("general.useragent.locale", "fr");\r\n')
+    assert sorted(os.listdir(tmp_path)) == ["prefs.js"]
+
+    # Nothing left to remove: prefs.js is not replaced again
+    with patch('models.firefox_blocker.os.replace') as replace:
+        assert blocker.unblock_sites()
+    replace.assert_not_called()
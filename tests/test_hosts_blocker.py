@@ -0,0 +1,116 @@
+import errno
+import os
+from unittest.mock import patch
+import pytest
+from models.hosts_blocker import WebsiteBlocker
+from models.hosts_file import BEGIN_MARKER, END_MARKER
+from models.blocklist_matcher import BlocklistMatcher
+
+USER_LINES = "127.0.0.1 localhost\n::1 localhost\n# keep me\n0.0.0.0 ads.example\n"
+
+
+@pytest.fixture
+def blocker(tmp_path):
+    hosts = tmp_path / 'hosts'
+    hosts.write_text(USER_LINES)
+    with patch('models.hosts_blocker.get_hosts_path', return_value=str(hosts)):
+        yield WebsiteBlocker(BlocklistMatcher(['youtube.com', 'reddit.com']))
+
+
+def _read(blocker):
+    with open(blocker.hosts_path) as f:
+        return f.read()
+
+
+def test_block_writes_one_managed_section(blocker):
+    blocker.block_websites()
+    content = _read(blocker)
+    assert content.startswith(USER_LINES)
+    section = content[len(USER_LINES):].splitlines()
+    assert section[0] == BEGIN_MARKER and section[-1] == END_MARKER
+    assert sorted(section[1:-1]) == [f"127.0.0.1 {site}" for site in blocker.blocked_sites]
+    assert blocker.is_blocked()
+
+    # Nothing changed, so the file is not rewritten
+    with patch('models.hosts_file.os.replace') as replace:
+        blocker.block_websites()
+    replace.assert_not_called()
+    assert _read(blocker) == content
+
+
+def test_unblock_restores_other_lines(blocker):
+    # Legacy entries appended without markers are cleaned up too
+    with open(blocker.hosts_path, 'a') as f:
+        f.write("127.0.0.1 youtube.com\n")
+    blocker.block_websites()
+    blocker.unblock_websites()
+    assert _read(blocker) == USER_LINES
+    assert not blocker.is_blocked()
+    assert os.listdir(os.path.dirname(blocker.hosts_path)) == ['hosts']
+
+
+def test_failed_write_leaves_hosts_untouched(blocker):
+    with patch('models.hosts_file.os.fsync', side_effect=OSError(errno.ENOSPC, 'full')):
+        with pytest.raises(OSError):
+            blocker.block_websites()
+    assert _read(blocker) == USER_LINES
+    assert os.listdir(os.path.dirname(blocker.hosts_path)) == ['hosts']
+
+
+def test_busy_hosts_file_is_rewritten_in_place(blocker):
+    busy = OSError(errno.EBUSY, 'Device or resource busy')
+    with patch('models.hosts_file.os.replace', side_effect=busy):
+        blocker.block_websites()
+    assert BEGIN_MARKER in _read(blocker)
+    assert os.listdir(os.path.dirname(blocker.hosts_path)) == ['hosts']
+
+
+def test_status_reuses_the_parsed_index(blocker):
+    assert not blocker.is_blocked()
+    index = blocker.hosts.index()
+    assert index.entries['ads.example'] == ('0.0.0.0', 3)
+
+    # Unchanged file: a stat() and the cached answer, no read
+    with patch('builtins.open', side_effect=AssertionError('re-read')):
+        assert not blocker.is_blocked()
+    assert blocker.hosts.index() is index
+
+    # Our own writes refresh the index without another parse
+    blocker.block_websites()
+    with patch('builtins.open', side_effect=AssertionError('re-read')):
+        assert blocker.is_blocked()
+
+    # An outside edit changes (st_mtime_ns, st_size) and is picked up
+    with open(blocker.hosts_path, 'w') as f:
+        f.write(USER_LINES)
+    assert not blocker.is_blocked()
+    assert 'youtube.com' not in blocker.hosts.index().entries
+
+
+def test_imported_names_are_streamed_not_indexed(blocker, tmp_path):
+    from models.blocklist_store import BlocklistStore
+    imported = tmp_path / 'list.txt'
+    imported.write_text("0.0.0.0 ads.example.com\n0.0.0.0 youtube.com\n")
+    store = BlocklistStore(str(tmp_path / 'blocklist.db'))
+    store.import_file(str(imported))
+    blocker.matcher.store = store
+
+    blocker.block_websites()
+    section = _read(blocker)[len(USER_LINES):].splitlines()
+    assert section[-2:] == ["127.0.0.1 ads.example.com", END_MARKER]
+    assert len(section) == len(blocker.blocked_sites) + 3
+    # The index keeps only the lines outside the section
+    index = blocker.hosts.index()
+    assert index.lines == USER_LINES.splitlines()
+    assert index.section.size == len(blocker.blocked_sites) + 1
+    assert 'ads.example.com' not in index.entries
+    assert blocker.is_blocked()
+    store.close()
+
+
+def test_unterminated_section_is_left_alone(blocker):
+    with open(blocker.hosts_path, 'a') as f:
+        f.write(f"{BEGIN_MARKER}\n10.0.0.1 nas.local\n")
+    blocker.unblock_websites()
+    assert _read(blocker).endswith("10.0.0.1 nas.local\n")
+    assert blocker.hosts.index().entries['nas.local'] == ('10.0.0.1', 5)
@@ -0,0 +1,76 @@
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd
+from gui.stats.plot_manager import SessionPlotManager, choose_plot_mode
+
+
+def _sessions(durations):
+    return pd.DataFrame({
+        'date': ['2024-01-01'] * len(durations),
+        'start': pd.date_range('2024-01-01 09:00', periods=len(durations), freq='h'),
+        'duration': durations,
+    })
+
+
+def test_refresh_updates_artists_in_place():
+    manager = SessionPlotManager()
+    figure = manager.create_session_plot(_sessions([30, 45]))
+    bars = manager.bars
+
+    assert manager.create_session_plot(_sessions([35, 90])) is figure
+    assert manager.bars is bars
+    assert [bar.get_height() for bar in bars] == [35, 90]
+    assert [label.get_text() for label in manager.bar_labels] == ['35m', '90m']
+    assert manager.ax.get_ylim()[1] >= 90
+    manager.cleanup()
+
+
+def test_bar_count_change_rebuilds_axes():
+    manager = SessionPlotManager()
+    figure = manager.create_session_plot(_sessions([30, 45]))
+    bars = manager.bars
+    assert manager.create_session_plot(_sessions([10, 20, 30])) is figure
+    assert manager.bars is not bars
+    assert len(manager.ax.patches) == 3
+    manager.cleanup()
+
+
+def _history(days, per_day=2):
+    starts = pd.date_range('2022-01-03 09:00', periods=days, freq='D').repeat(per_day)
+    starts = starts + pd.to_timedelta(list(range(per_day)) * days, unit='h')
+    return pd.DataFrame({
+        'date': starts.strftime('%Y-%m-%d'),
+        'start': starts,
+        'duration': [30] * len(starts),
+    })
+
+
+def test_mode_follows_point_count():
+    assert choose_plot_mode(_history(10)) == 'sessions'
+    assert choose_plot_mode(_history(90)) == 'daily'
+    assert choose_plot_mode(_history(400)) == 'weekly'
+    assert choose_plot_mode(_history(365 * 3)) == 'heatmap'
+
+
+def test_weekly_totals_bound_the_bar_count():
+    manager = SessionPlotManager()
+    manager.create_session_plot(_history(28), mode='weekly')
+    # 2022-01-03 is a Monday, so 28 days are exactly four full weeks
+    assert [bar.get_height() for bar in manager.bars] == [420] * 4
+    assert manager.bar_labels == []
+    manager.cleanup()
+
+
+def test_heatmap_is_one_image_updated_in_place():
+    manager = SessionPlotManager()
+    manager.create_session_plot(_history(365 * 3))
+    image = manager.image
+    assert len(manager.ax.images) == 1 and not manager.ax.patches
+    grid = image.get_array()
+    assert grid.shape == (7, 24)
+    assert grid[0, 9] == grid[0, 10] > 0 and grid[0, 11] == 0
+
+    manager.create_session_plot(_history(365 * 4))
+    assert manager.image is image
+    assert image.get_array()[0, 9] > grid[0, 9]
+    manager.cleanup()
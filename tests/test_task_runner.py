@@ -0,0 +1,79 @@
+import queue
+import threading
+from gui.task_runner import TaskRunner
+
+
+def _drain(calls):
+    """Stand-in for the app's after() loop"""
+    while True:
+        try:
+            calls.get_nowait()()
+        except queue.Empty:
+            return
+
+
+def test_results_and_errors_come_back_through_notify():
+    calls = queue.Queue()
+    busy = []
+    runner = TaskRunner(calls.put, on_busy=busy.append)
+    done, errors = [], []
+    runner.run(lambda token: 42, on_done=done.append, label="answer")
+    runner.run(lambda token: 1 / 0, on_error=errors.append)
+    runner.shutdown(cancel=False)
+
+    # Nothing reaches the callbacks until the Tk thread drains the queue
+    assert done == [] and errors == []
+    _drain(calls)
+    assert done == [42]
+    assert isinstance(errors[0], ZeroDivisionError)
+    assert busy[0] == "answer" and busy[-1] is None
+
+
+def test_cancel_all_stops_running_and_queued_tasks():
+    calls = queue.Queue()
+    runner = TaskRunner(calls.put)
+    started = threading.Event()
+    done = []
+
+    def long_task(token):
+        started.set()
+        token.event.wait(timeout=5)
+        token.raise_if_cancelled()
+        return "finished"
+
+    runner.run(long_task, on_done=done.append)
+    runner.run(lambda token: "queued", on_done=done.append)
+    assert started.wait(timeout=2)
+    runner.cancel_all()
+    runner.shutdown()
+    _drain(calls)
+    assert done == []
+    assert not runner.busy
+
+
+def test_always_run_tasks_survive_cancel_and_shutdown():
+    calls = queue.Queue()
+    runner = TaskRunner(calls.put)
+    started = threading.Event()
+    release = threading.Event()
+    done, seen_cancel = [], []
+
+    def blocker(token):
+        started.set()
+        release.wait(timeout=5)
+
+    def end_session(token):
+        # Runs anyway, but can see it was asked to hurry
+        seen_cancel.append(token.cancelled)
+        return "ended"
+
+    runner.run(blocker)
+    runner.run(lambda token: "status", on_done=done.append)
+    runner.run(end_session, on_done=done.append, always_run=True)
+    assert started.wait(timeout=2)
+    runner.cancel_all()
+    release.set()
+    runner.shutdown()
+    _drain(calls)
+    assert done == ["ended"]
+    assert seen_cancel == [True]